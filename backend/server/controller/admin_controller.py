@@ -1,13 +1,30 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
-from django.db.models import Sum
 from django.utils import timezone
 from datetime import timedelta
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
-from ..models import Product, Order, Category, User, AdminStaff
-from ..serializers import ProductSerializer, CategorySerializer
+from ..models import Product, Order, Category, User, AdminStaff, InventoryMovement
+from ..serializers import ProductSerializer, ProductReadSerializer, CategorySerializer
+from ..services import select_fields, is_paginated_request, paginate_keyset
+from ..services.catalog_service import (
+    decode_cursor,
+    encode_cursor,
+    get_list_param,
+    get_sort,
+)
+from ..services.inventory_service import available_stock, ledger_stock
+from ..services.order_service import (
+    ADMIN_ORDER_SORTS,
+    estimated_count,
+    filter_admin_orders,
+    order_items_prefetch,
+    parse_order_ids,
+    transition_orders,
+)
+from ..services.sales_rollup_service import MAX_TIMESERIES_DAYS, sales_timeseries
+from ..services.stats_service import order_stats, parse_days, product_stats
 
 
 @api_view(["GET"])
@@ -22,22 +39,74 @@ def get_admin_stats(request):
             {"error": "Admin access required"}, status=status.HTTP_403_FORBIDDEN
         )
 
-    days = int(request.GET.get("days", 30))
-    start_date = timezone.now() - timedelta(days=days)
-
-    stats = {
-        "total_sales": Order.objects.filter(
-            created_at__gte=start_date, status="delivered"
-        ).aggregate(total=Sum("total_amount"))["total"]
-        or 0,
-        "total_orders": Order.objects.filter(created_at__gte=start_date).count(),
-        "pending_orders": Order.objects.filter(status="pending").count(),
-        "low_stock_products": Product.objects.filter(stock__lt=10).count(),
-    }
+    try:
+        days = parse_days(request.GET.get("days"))
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+    # One aggregate per table, each cached for ADMIN_STATS_TTL seconds
+    stats = {**order_stats(days), **product_stats()}
     return Response({"status": "success", "data": stats})
 
 
+@api_view(["GET"])
+def get_sales_timeseries(request):
+    """
+    Orders, units and revenue per day over the last ``days`` days, read
+    from the daily sales rollups. ``category`` (slug) or ``product`` (id)
+    narrow the series; ``status`` picks the order statuses counted, all
+    but cancelled by default.
+    """
+    if not request.user.is_authenticated:
+        return Response(
+            {"error": "Authentication required"}, status=status.HTTP_401_UNAUTHORIZED
+        )
+
+    if not (request.user.is_staff or request.user.is_superuser):
+        return Response(
+            {"error": "Admin access required"}, status=status.HTTP_403_FORBIDDEN
+        )
+
+    try:
+        days = parse_days(request.GET.get("days"))
+        if days > MAX_TIMESERIES_DAYS:
+            raise ValueError(f"days must be at most {MAX_TIMESERIES_DAYS}")
+        valid = {choice for choice, _label in Order.STATUS_CHOICES}
+        statuses = get_list_param(request.GET, "status") or sorted(
+            valid - {"cancelled"}
+        )
+        unknown = [value for value in statuses if value not in valid]
+        if unknown:
+            raise ValueError(f"Unknown status: {', '.join(unknown)}")
+
+        category_id = product_id = None
+        if request.GET.get("product"):
+            product = request.GET["product"]
+            if not product.isdigit():
+                raise ValueError("product must be an integer")
+            product_id = int(product)
+        elif request.GET.get("category"):
+            category_id = (
+                Category.objects.filter(slug=request.GET["category"])
+                .values_list("id", flat=True)
+                .first()
+            )
+            if category_id is None:
+                raise ValueError(f"Unknown category: {request.GET['category']}")
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    end = timezone.localdate()
+    start = end - timedelta(days=days - 1)
+    series = sales_timeseries(start, end, statuses, category_id, product_id)
+    return Response(
+        {
+            "status": "success",
+            "data": {"from": start, "to": end, "series": series},
+        }
+    )
+
+
 @api_view(["GET", "POST", "PUT", "DELETE"])
 def manage_products(request, product_id=None):
     if not request.user.is_authenticated:
@@ -51,18 +120,23 @@ def manage_products(request, product_id=None):
         )
 
     if request.method == "GET":
+        try:
+            fields = select_fields(request.GET, ProductReadSerializer.field_names())
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         if product_id:
-            try:
-                product = Product.objects.get(id=product_id)
-                serializer = ProductSerializer(product)
-                return Response(serializer.data)
-            except Product.DoesNotExist:
+            rows = ProductReadSerializer.annotate(
+                Product.objects.filter(id=product_id), fields
+            ).values(*ProductReadSerializer.columns(fields))
+            if not rows:
                 return Response(
                     {"error": "Product not found"}, status=status.HTTP_404_NOT_FOUND
                 )
+            serializer = ProductReadSerializer(rows[0], many=False, fields=fields)
+            return Response(serializer.data)
         else:
             products = Product.objects.all()
-            serializer = ProductSerializer(products, many=True)
+            serializer = ProductReadSerializer(products, many=True, fields=fields)
             return Response(serializer.data)
 
     elif request.method == "POST":
@@ -96,6 +170,116 @@ def manage_products(request, product_id=None):
             )
 
 
+@api_view(["GET"])
+def get_product_inventory(request, product_id):
+    """
+    A product's stock according to the inventory ledger and its movement
+    history, newest first. Pages with ``limit`` and the returned
+    ``next_cursor``.
+    """
+    if not request.user.is_authenticated:
+        return Response(
+            {"error": "Authentication required"}, status=status.HTTP_401_UNAUTHORIZED
+        )
+
+    if not (request.user.is_staff or request.user.is_superuser):
+        return Response(
+            {"error": "Admin access required"}, status=status.HTTP_403_FORBIDDEN
+        )
+
+    try:
+        limit = max(1, min(int(request.GET.get("limit", 50)), 200))
+        movements = InventoryMovement.objects.filter(product_id=product_id)
+        cursor = request.GET.get("cursor")
+        if cursor:
+            _value, last_id = decode_cursor(cursor, "movements")
+            movements = movements.filter(id__lt=last_id)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    product = (
+        Product.objects.filter(id=product_id)
+        .annotate(ledger=ledger_stock(), available=available_stock())
+        .values("ledger", "available")
+        .first()
+    )
+    if product is None:
+        return Response(
+            {"error": "Product not found"}, status=status.HTTP_404_NOT_FOUND
+        )
+
+    page = list(
+        movements.order_by("-id").values(
+            "id", "kind", "quantity", "order_id", "created_at"
+        )[: limit + 1]
+    )
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_cursor = encode_cursor("movements", None, page[-1]["id"])
+
+    return Response(
+        {
+            "stock": product["ledger"],
+            "available": product["available"],
+            "movements": page,
+            "next_cursor": next_cursor,
+        }
+    )
+
+
+# Output fields of the staff order endpoints and how to render each one
+ORDER_LIST_FIELDS = {
+    "id": lambda order: order.id,
+    "order_number": lambda order: order.order_number,
+    "status": lambda order: order.status,
+    "total_amount": lambda order: str(order.total_amount),
+    "created_at": lambda order: order.created_at,
+    "item_count": lambda order: order.item_count,
+    "summary": lambda order: order.summary,
+    "user": lambda order: order.user.username,
+}
+ORDER_DETAIL_FIELDS = {
+    "id": lambda order: order.id,
+    "order_number": lambda order: order.order_number,
+    "status": lambda order: order.status,
+    "total_amount": lambda order: str(order.total_amount),
+    "shipping_address": lambda order: order.shipping_address,
+    "created_at": lambda order: order.created_at,
+    "item_count": lambda order: order.item_count,
+    "summary": lambda order: order.summary,
+    "items": lambda order: [
+        {
+            "product_id": item.product_id,
+            "product": item.product_name,
+            "sku": item.product_sku,
+            "quantity": item.quantity,
+            "price": str(item.price),
+        }
+        for item in order.items.all()
+    ],
+    "user": lambda order: order.user.username,
+}
+
+
+def _select_order_columns(orders, fields):
+    """
+    Only load the Order columns (and the username) the output needs, plus
+    the sort keys the cursor is built from
+    """
+    columns = [name for name in fields if name not in ("items", "user")]
+    if "user" in fields:
+        orders = orders.select_related("user")
+        columns.append("user__username")
+    if "items" in fields:
+        orders = orders.prefetch_related(order_items_prefetch())
+    return orders.only("id", "created_at", "total_amount", *columns)
+
+
+def _render_order(order, fields, available):
+    return {name: available[name](order) for name in fields}
+
+
 @api_view(["GET", "PUT"])
 def manage_orders(request, order_id=None):
     if not request.user.is_authenticated:
@@ -109,70 +293,108 @@ def manage_orders(request, order_id=None):
         )
 
     if request.method == "GET":
+        available = ORDER_DETAIL_FIELDS if order_id else ORDER_LIST_FIELDS
+        try:
+            fields = select_fields(request.GET, list(available))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        orders = _select_order_columns(Order.objects.all(), fields)
+
         if order_id:
             try:
-                order = Order.objects.get(id=order_id)
-                return Response(
-                    {
-                        "id": order.id,
-                        "order_number": order.order_number,
-                        "status": order.status,
-                        "total_amount": str(order.total_amount),
-                        "shipping_address": order.shipping_address,
-                        "created_at": order.created_at,
-                        "items": [
-                            {
-                                "product": item.product.name,
-                                "quantity": item.quantity,
-                                "price": str(item.price),
-                            }
-                            for item in order.items.all()
-                        ],
-                        "user": order.user.username,
-                    }
-                )
+                order = orders.get(id=order_id)
+                return Response(_render_order(order, fields, available))
             except Order.DoesNotExist:
                 return Response(
                     {"error": "Order not found"}, status=status.HTTP_404_NOT_FOUND
                 )
-        else:
-            orders = Order.objects.all().order_by("-created_at")
-            return Response(
-                [
-                    {
-                        "id": order.id,
-                        "order_number": order.order_number,
-                        "status": order.status,
-                        "total_amount": str(order.total_amount),
-                        "created_at": order.created_at,
-                        "user": order.user.username,
-                    }
-                    for order in orders
-                ]
-            )
-
-    elif request.method == "PUT":
         try:
-            order = Order.objects.get(id=order_id)
-            # Only allow updating order status
-            new_status = request.data.get("status")
-            if new_status in [s[0] for s in Order.STATUS_CHOICES]:
-                order.status = new_status
-                order.save()
+            orders = filter_admin_orders(orders, request.GET)
+            if is_paginated_request(request.GET):
+                count, count_is_estimate = estimated_count(orders)
+                page, next_cursor = paginate_keyset(
+                    orders,
+                    request.GET,
+                    sorts=ADMIN_ORDER_SORTS,
+                    default_sort="newest",
+                )
                 return Response(
                     {
-                        "id": order.id,
-                        "order_number": order.order_number,
-                        "status": order.status,
+                        "results": [
+                            _render_order(order, fields, ORDER_LIST_FIELDS)
+                            for order in page
+                        ],
+                        "next_cursor": next_cursor,
+                        "count": count,
+                        "count_is_estimate": count_is_estimate,
                     }
                 )
+            sort = get_sort(request.GET, ADMIN_ORDER_SORTS, "newest")
+            orders = orders.order_by(*ADMIN_ORDER_SORTS[sort])
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            [_render_order(order, fields, ORDER_LIST_FIELDS) for order in orders]
+        )
+
+    elif request.method == "PUT":
+        # Only allow updating order status, along Order.STATUS_TRANSITIONS
+        try:
+            (outcome,) = transition_orders([order_id], request.data.get("status"))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if outcome["result"] == "not_found":
             return Response(
-                {"error": "Invalid status"}, status=status.HTTP_400_BAD_REQUEST
+                {"error": "Order not found"}, status=status.HTTP_404_NOT_FOUND
             )
-        except Order.DoesNotExist:
+        if outcome["result"] == "invalid_transition":
             return Response(
-                {"error": "Order not found"}, status=status.HTTP_404_NOT_FOUND
+                {
+                    "error": f"Cannot change status from {outcome['from']} "
+                    f"to {request.data.get('status')}"
+                },
+                status=status.HTTP_400_BAD_REQUEST,
             )
+        order = Order.objects.only("id", "order_number", "status").get(id=order_id)
+        return Response(
+            {
+                "id": order.id,
+                "order_number": order.order_number,
+                "status": order.status,
+            }
+        )
+
+
+@api_view(["POST"])
+def bulk_update_order_status(request):
+    """
+    Move many orders to one status: {"order_ids": [...], "status": "shipped"}.
+    Orders that cannot make the transition are left alone and reported in
+    the per-order results.
+    """
+    if not request.user.is_authenticated:
+        return Response(
+            {"error": "Authentication required"}, status=status.HTTP_401_UNAUTHORIZED
+        )
+
+    if not (request.user.is_staff or request.user.is_superuser):
+        return Response(
+            {"error": "Admin access required"}, status=status.HTTP_403_FORBIDDEN
+        )
+
+    try:
+        order_ids = parse_order_ids(request.data.get("order_ids"))
+        results = transition_orders(order_ids, request.data.get("status"))
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(
+        {
+            "status": request.data.get("status"),
+            "updated": sum(result["result"] == "updated" for result in results),
+            "results": results,
+        }
+    )
 
 
 @api_view(["GET"])
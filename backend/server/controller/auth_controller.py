@@ -5,6 +5,7 @@ from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
 from django.utils.html import format_html
+import logging
 import uuid
 import re
 
@@ -15,6 +16,9 @@ from rest_framework.permissions import IsAuthenticated
 
 from ..models.auth_model import Token
 from ..models.user_model import User
+from ..services.cart_service import merge_cart, parse_cart_lines
+
+logger = logging.getLogger(__name__)
 
 
 @api_view(["POST"])
@@ -166,6 +170,13 @@ def login(request):
     if user:
         token, _ = Token.objects.get_or_create(user=user)
 
+        # Carry over the cart the browser kept while signed out
+        if data.get("cart"):
+            try:
+                merge_cart(user, parse_cart_lines(data.get("cart")))
+            except ValueError as e:
+                logger.warning("Could not merge the cart of user %s: %s", user.pk, e)
+
         return Response(
             {
                 "status": "success",
@@ -0,0 +1,81 @@
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from ..services.cart_service import (
+    add_to_cart,
+    cart_summary,
+    clear_cart,
+    merge_cart,
+    parse_cart_lines,
+    remove_from_cart,
+    update_cart,
+)
+
+
+def _cart_response(user, status_code=status.HTTP_200_OK):
+    return Response(
+        {"status": "success", "data": cart_summary(user)}, status=status_code
+    )
+
+
+def _error(message):
+    return Response(
+        {"status": "error", "message": message}, status=status.HTTP_400_BAD_REQUEST
+    )
+
+
+def _request_items(data):
+    """Lines given as ``items``, or a single product_id/quantity pair"""
+    if "items" in data:
+        return data.get("items")
+    return [data]
+
+
+@api_view(["GET", "DELETE"])
+@permission_classes([IsAuthenticated])
+def manage_cart(request):
+    """Get the cart of the authenticated user, or empty it"""
+    if request.method == "DELETE":
+        clear_cart(request.user)
+    return _cart_response(request.user)
+
+
+@api_view(["POST", "PUT"])
+@permission_classes([IsAuthenticated])
+def manage_cart_items(request):
+    """
+    POST adds the given quantities to the cart, PUT sets them, with a
+    quantity of 0 removing the line. Either takes ``items`` or a single
+    ``product_id`` and ``quantity``.
+    """
+    try:
+        if request.method == "POST":
+            add_to_cart(request.user, parse_cart_lines(_request_items(request.data)))
+        else:
+            update_cart(
+                request.user,
+                parse_cart_lines(_request_items(request.data), allow_zero=True),
+            )
+    except ValueError as e:
+        return _error(str(e))
+    return _cart_response(request.user)
+
+
+@api_view(["DELETE"])
+@permission_classes([IsAuthenticated])
+def remove_cart_item(request, product_id):
+    remove_from_cart(request.user, [product_id])
+    return _cart_response(request.user)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def merge_guest_cart(request):
+    """Merge the cart the browser kept while signed out, right after login"""
+    try:
+        merge_cart(request.user, parse_cart_lines(request.data.get("items")))
+    except ValueError as e:
+        return _error(str(e))
+    return _cart_response(request.user)
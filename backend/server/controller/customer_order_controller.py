@@ -3,14 +3,34 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-import uuid
-from decimal import Decimal
-from ..models import Order, OrderItem, Product, User
+from ..models import Order, User
+from ..services import (
+    select_fields,
+    is_paginated_request,
+    paginate_keyset,
+    parse_order_lines,
+    place_order,
+)
+from ..services.order_service import (
+    ORDER_SORTS,
+    filter_order_status,
+    order_items_prefetch,
+    quote_order,
+    read_quote,
+    use_quote,
+)
+from ..services.cart_service import cart_lines, take_ordered
+from ..services.idempotency_service import idempotent
+from ..services.sales_rollup_service import move_order_sales
+from ..services.stats_service import invalidate_admin_stats
+from ..services.inventory_service import commit_reservations, order_quantities
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@idempotent
 def create_order(request):
     user = request.user
     data = request.data
@@ -53,66 +73,42 @@ def create_order(request):
             # Log the error but continue with order creation
             print(f"Error saving address: {str(e)}")
 
+    # Without items the order is placed from the server side cart. A quote
+    # from get_order_quote fixes the lines and their prices, for one order.
     items_data = data.get("items")
-    if not items_data:
-        return Response(
-            {"status": "error", "message": "No cart found and no cart items provided"},
-            status=status.HTTP_400_BAD_REQUEST,
-        )
-
     try:
+        prices = None
+        from_cart = not items_data
+        if data.get("quote"):
+            lines, prices, from_cart = read_quote(data.get("quote"), user)
+            if items_data and order_quantities(
+                parse_order_lines(items_data)
+            ) != order_quantities(lines):
+                raise ValueError("Quote does not match the items")
+        elif items_data:
+            lines = parse_order_lines(items_data)
+        else:
+            lines = cart_lines(user)
+        if not lines:
+            raise ValueError("No cart found and no cart items provided")
         with transaction.atomic():
-            order_number = f"ORD-{uuid.uuid4().hex[:8].upper()}"
-            total_amount = Decimal("0.00")
-
-            # Create order
-            order = Order.objects.create(
-                user=user,
-                order_number=order_number,
-                shipping_address=shipping_address,
-                total_amount=total_amount,
-                payment_status=False,
-            )
-
-            # Create order items
-            for item_data in items_data:
-                product_id = item_data.get("product_id")
-                quantity = item_data.get("quantity", 1)
-                price = Decimal(str(item_data.get("price")))
-                try:
-                    product = Product.objects.get(id=product_id)
-                    if product.stock < quantity:
-                        raise ValueError(
-                            f"Not enough stock for {product.name}. Available: {product.stock}"
-                        )
-
-                    product.stock -= quantity
-                    product.save()
-
-                except Product.DoesNotExist:
-                    raise ValueError(f"Product with ID {product_id} not found")
-
-                OrderItem.objects.create(
-                    order=order, product=product, quantity=quantity, price=price
-                )
-
-                total_amount += price * quantity
-
-            order.total_amount = total_amount
-            order.save()
-
-            return Response(
-                {
-                    "status": "success",
-                    "message": "Order created successfully",
-                    "data": {
-                        "order_id": order.id,
-                        "order_number": order.order_number,
-                        "total_amount": str(order.total_amount),
-                    },
+            if data.get("quote"):
+                use_quote(data.get("quote"), user)
+            order = place_order(user, shipping_address, lines, prices)
+            if from_cart:
+                take_ordered(user, lines)
+        return Response(
+            {
+                "status": "success",
+                "message": "Order created successfully",
+                "data": {
+                    "order_id": order.id,
+                    "order_number": order.order_number,
+                    "total_amount": str(order.total_amount),
                 },
-                status=status.HTTP_201_CREATED,
-            )
+            },
+            status=status.HTTP_201_CREATED,
+        )
 
     except ValueError as e:
         return Response(
@@ -127,31 +123,78 @@ def create_order(request):
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+def get_order_quote(request):
+    """
+    Price the ``items`` given, or the server side cart, and check their
+    stock in one query. When every line can be ordered the response holds a
+    short-lived ``quote`` token that create_order accepts to keep these
+    prices.
+    """
+    user = request.user
+    items_data = request.data.get("items")
+    try:
+        if items_data:
+            quote = quote_order(user, parse_order_lines(items_data))
+        else:
+            quote = quote_order(user, cart_lines(user), from_cart=True)
+        if not quote["items"]:
+            raise ValueError("No cart found and no cart items provided")
+    except ValueError as e:
+        return Response(
+            {"status": "error", "message": str(e)}, status=status.HTTP_400_BAD_REQUEST
+        )
+    return Response({"status": "success", "data": quote}, status=status.HTTP_200_OK)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+@idempotent
 def process_payment(request, order_id):
     """Process payment for a specific order"""
     user = request.user
     data = request.data
 
     try:
-        # Get the order and verify it belongs to the authenticated user
-        order = get_object_or_404(Order, id=order_id, user=user)
-
-        # Update order payment details
-        order.payment_status = data.get("payment_status", True)
-
-        # Update payment method
-        order.payment_method = data.get("payment_method", "credit_card")
-
-        # Set payment date to current time
-        from django.utils import timezone
-
-        order.payment_date = timezone.now()
-
-        # Update order status to processing after payment
-        order.status = "processing"
-
-        # Save the order
-        order.save()
+        with transaction.atomic():
+            # Get the order and verify it belongs to the authenticated user,
+            # locked so that a concurrent payment or cancel is seen here
+            # rather than overwritten
+            order = get_object_or_404(
+                Order.objects.select_for_update(), id=order_id, user=user
+            )
+            if order.status != "processing" and (
+                "processing" not in Order.STATUS_TRANSITIONS[order.status]
+            ):
+                raise ValueError(f"Order is {order.status}")
+
+            # Update order payment details
+            order.payment_status = data.get("payment_status", True)
+
+            # Update payment method
+            order.payment_method = data.get("payment_method", "credit_card")
+
+            # Set payment date to current time
+            order.payment_date = timezone.now()
+
+            # Update order status to processing after payment
+            previous_status = order.status
+            order.status = "processing"
+
+            # Save the order, turning its stock holds into sales
+            if order.payment_status:
+                commit_reservations(order)
+            order.save(
+                update_fields=[
+                    "payment_status",
+                    "payment_method",
+                    "payment_date",
+                    "status",
+                    "updated_at",
+                ]
+            )
+            if previous_status != order.status:
+                move_order_sales({order.id: previous_status}, order.status)
+            invalidate_admin_stats("orders")
 
         return Response(
             {
@@ -181,79 +224,94 @@ def get_user_by_id(request, user_id):
         return Response({"error": "User not found"}, status=404)
 
 
+# Output fields of the customer order history and how to render each one
+USER_ORDER_FIELDS = {
+    "id": lambda order: order.id,
+    "order_number": lambda order: order.order_number,
+    "status": lambda order: order.status,
+    "total_amount": lambda order: str(order.total_amount),
+    "shipping_address": lambda order: order.shipping_address,
+    "payment_status": lambda order: order.payment_status,
+    "created_at": lambda order: order.created_at,
+    "item_count": lambda order: order.item_count,
+    "summary": lambda order: order.summary,
+    "items": lambda order: [
+        {
+            "product_id": item.product_id,
+            "product": item.product_name,
+            "sku": item.product_sku,
+            "image": item.product_image,
+            "quantity": item.quantity,
+            "price": str(item.price),
+            "subtotal": str(item.price * item.quantity),
+        }
+        for item in order.items.all()
+    ],
+}
+
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def get_user_orders(request):
-    """Get all orders for the authenticated user"""
+    """
+    Get the orders of the authenticated user, newest first, optionally
+    narrowed by ``status``. Requests carrying ``limit`` or ``cursor`` get
+    one page and a ``next_cursor``. ``fields`` and ``exclude`` pick the
+    order fields returned. Items are loaded with one extra query per page;
+    ``item_count`` and ``summary`` describe them without it.
+    """
     user = request.user
-    orders = Order.objects.filter(user=user).order_by("-created_at")
-
-    orders_data = []
-    for order in orders:
-        order_items = []
-        for item in order.items.all():
-            order_items.append(
-                {
-                    "product": item.product.name,
-                    "quantity": item.quantity,
-                    "price": str(item.price),
-                    "subtotal": str(item.price * item.quantity),
-                }
+    try:
+        fields = select_fields(request.GET, list(USER_ORDER_FIELDS))
+        orders = filter_order_status(Order.objects.filter(user=user), request.GET)
+        columns = [name for name in fields if name != "items"]
+        orders = orders.only("id", "created_at", *columns)
+        if "items" in fields:
+            orders = orders.prefetch_related(order_items_prefetch())
+
+        next_cursor = None
+        if is_paginated_request(request.GET):
+            orders, next_cursor = paginate_keyset(
+                orders, request.GET, sorts=ORDER_SORTS, default_sort="newest"
             )
-
-        orders_data.append(
-            {
-                "id": order.id,
-                "order_number": order.order_number,
-                "status": order.status,
-                "total_amount": str(order.total_amount),
-                "shipping_address": order.shipping_address,
-                "payment_status": order.payment_status,
-                "created_at": order.created_at,
-                "items": order_items,
-            }
+        else:
+            orders = orders.order_by(*ORDER_SORTS["newest"])
+    except ValueError as e:
+        return Response(
+            {"status": "error", "message": str(e)},
+            status=status.HTTP_400_BAD_REQUEST,
         )
 
-    return Response(
-        {"status": "success", "data": orders_data},
-        status=status.HTTP_200_OK,
-    )
+    response = {
+        "status": "success",
+        "data": [
+            {name: USER_ORDER_FIELDS[name](order) for name in fields}
+            for order in orders
+        ],
+    }
+    if is_paginated_request(request.GET):
+        response["next_cursor"] = next_cursor
+    return Response(response, status=status.HTTP_200_OK)
 
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def get_order_details(request, order_id):
-    """Get details of a specific order"""
+    """Get details of a specific order, in two queries"""
     user = request.user
 
     try:
         # Ensure the order belongs to the authenticated user
-        order = Order.objects.get(id=order_id, user=user)
-
-        order_items = []
-        for item in order.items.all():
-            order_items.append(
-                {
-                    "product": item.product.name,
-                    "quantity": item.quantity,
-                    "price": str(item.price),
-                    "subtotal": str(item.price * item.quantity),
-                }
-            )
-
-        order_data = {
-            "id": order.id,
-            "order_number": order.order_number,
-            "status": order.status,
-            "total_amount": str(order.total_amount),
-            "shipping_address": order.shipping_address,
-            "payment_status": order.payment_status,
-            "created_at": order.created_at,
-            "items": order_items,
-        }
-
+        order = Order.objects.prefetch_related(order_items_prefetch()).get(
+            id=order_id, user=user
+        )
         return Response(
-            {"status": "success", "data": order_data},
+            {
+                "status": "success",
+                "data": {
+                    name: render(order) for name, render in USER_ORDER_FIELDS.items()
+                },
+            },
             status=status.HTTP_200_OK,
         )
     except Order.DoesNotExist:
@@ -1,12 +1,26 @@
-from django.db.models import Count
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from rest_framework.permissions import IsAdminUser
-from rest_framework.decorators import permission_classes
+from rest_framework.permissions import AllowAny, IsAdminUser
+from rest_framework.decorators import authentication_classes, permission_classes
 from rest_framework import status
 from server.models import Product, Category
-from server.serializers import ProductSerializer
+from server.serializers import ProductReadSerializer
+from server.services import (
+    filter_products,
+    sort_products,
+    paginate_keyset,
+    is_paginated_request,
+    get_product_facets,
+    search_products,
+    suggest_index,
+    select_fields,
+    parse_id_list,
+    recent_purchases,
+    recommended_products,
+)
+from server.services.inventory_service import available_stock
 from django.conf import settings
 import requests
 
@@ -16,131 +30,136 @@ class initializeController_Product:
         return "Initialize Controller"
 
 
+def _list_products(request, products):
+    """
+    Filter and sort ``products`` from the query string. Requests carrying
+    ``limit`` or ``cursor`` get one keyset page back, other requests keep
+    receiving the plain list. ``fields`` and ``exclude`` pick the columns.
+    """
+    try:
+        fields = select_fields(request.GET, ProductReadSerializer.field_names())
+        products = filter_products(products, request.GET)
+        if not is_paginated_request(request.GET):
+            products = sort_products(products, request.GET)
+            serializer = ProductReadSerializer(products, many=True, fields=fields)
+            return Response(serializer.data)
+        page, next_cursor = paginate_keyset(
+            ProductReadSerializer.annotate(products, fields),
+            request.GET,
+            fields=ProductReadSerializer.columns(fields),
+        )
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    serializer = ProductReadSerializer(page, many=True, fields=fields)
+    return Response({"results": serializer.data, "next_cursor": next_cursor})
+
+
 @api_view(["GET"])
 def get_all_products(request):
-    products = Product.objects.all()
-    serializer = ProductSerializer(products, many=True)
-    return Response(serializer.data)
+    """
+    List products. Supported query parameters: brand, connections,
+    price_range, price_min, price_max, search, is_active, category, sort
+    (default, price-low, price-high, name, newest), limit, cursor, fields
+    and exclude.
+    """
+    return _list_products(request, Product.objects.all())
+
+
+@api_view(["GET"])
+def search_product_catalog(request):
+    """
+    Full-text product search ranked by relevance, with a fuzzy fallback on
+    product names. Takes ``q`` plus the listing filters, sort, limit, cursor
+    and the ``mode`` returned by the previous page.
+    """
+    text = request.GET.get("q", "").strip()
+    if not text:
+        return Response(
+            {"error": "Search query is required"}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        fields = select_fields(request.GET, ProductReadSerializer.field_names())
+        products = ProductReadSerializer.annotate(
+            filter_products(Product.objects.all(), request.GET), fields
+        )
+        page, next_cursor, mode = search_products(
+            products, text, request.GET, fields=ProductReadSerializer.columns(fields)
+        )
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    serializer = ProductReadSerializer(page, many=True, fields=fields)
+    return Response(
+        {"results": serializer.data, "next_cursor": next_cursor, "mode": mode}
+    )
+
+
+@api_view(["GET"])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def suggest_products(request):
+    """
+    Suggest-as-you-type for the search box. Served from the in-process
+    prefix index; authentication is skipped so that a keystroke does not
+    cost a token lookup.
+    """
+    try:
+        limit = int(request.GET.get("limit", 8))
+    except ValueError:
+        return Response(
+            {"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST
+        )
+    suggestions = suggest_index.suggest(request.GET.get("q", ""), max(1, limit))
+    return Response({"results": suggestions})
 
 
 @api_view(["GET"])
 def get_product_by_category(request, category):
     try:
         category_obj = Category.objects.get(slug=category)
-        products = Product.objects.filter(category=category_obj)
-        serializer = ProductSerializer(products, many=True)
-        return Response(serializer.data)
     except Category.DoesNotExist:
         return Response({"error": "Category not found"}, status=404)
+    return _list_products(request, Product.objects.filter(category=category_obj))
+
+
+def _product_detail(request, id):
+    try:
+        fields = select_fields(request.GET, ProductReadSerializer.field_names())
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    rows = ProductReadSerializer.annotate(Product.objects.filter(pk=id), fields).values(
+        *ProductReadSerializer.columns(fields)
+    )
+    if not rows:
+        raise Http404("No Product matches the given query.")
+    serializer = ProductReadSerializer(rows[0], many=False, fields=fields)
+    return Response(serializer.data)
 
 
 @api_view(["GET"])
 def get_product_detailed(request, category, id):
-    product = get_object_or_404(Product, pk=id)
-    serializer = ProductSerializer(product)
-    return Response(serializer.data)
+    return _product_detail(request, id)
 
 
 @api_view(["GET"])
 def get_product_detailed_single_route(request, id):
-    product = get_object_or_404(Product, pk=id)
-    serializer = ProductSerializer(product)
-    return Response(serializer.data)
+    return _product_detail(request, id)
 
 
 @api_view(["GET"])
 def get_product_filters(request):
     """
-    Get unique filter options for the product filters
-    Returns all unique brands, connection types, etc. from the products database
+    Get filter options with product counts for the product filters.
+    Accepts the same query parameters as the product listing, so the counts
+    reflect the current selection.
     """
-    # Get unique brands and count of products for each
-    brands = (
-        Product.objects.values("brand").annotate(count=Count("brand")).order_by("brand")
-    )
-
-    # Get unique connection types and count of products for each
-    connections = (
-        Product.objects.values("connections")
-        .annotate(count=Count("connections"))
-        .order_by("connections")
-    )
-
-    # Get price ranges (calculated on the fly)
-    price_min = (
-        Product.objects.order_by("price").first().price
-        if Product.objects.exists()
-        else 0
-    )
-    price_max = (
-        Product.objects.order_by("-price").first().price
-        if Product.objects.exists()
-        else 1000
-    )
-
-    # Create price ranges based on actual data
-    price_ranges = []
-    if Product.objects.exists():
-        # Define price ranges
-        if price_min < 100:
-            price_ranges.append(
-                {
-                    "name": "Under $100",
-                    "min": 0,
-                    "max": 99.99,
-                    "count": Product.objects.filter(price__lt=100).count(),
-                }
-            )
-
-        if price_min < 300 and price_max > 100:
-            price_ranges.append(
-                {
-                    "name": "$100 - $300",
-                    "min": 100,
-                    "max": 299.99,
-                    "count": Product.objects.filter(
-                        price__gte=100, price__lt=300
-                    ).count(),
-                }
-            )
-
-        if price_min < 500 and price_max > 300:
-            price_ranges.append(
-                {
-                    "name": "$300 - $500",
-                    "min": 300,
-                    "max": 499.99,
-                    "count": Product.objects.filter(
-                        price__gte=300, price__lt=500
-                    ).count(),
-                }
-            )
-
-        if price_max > 500:
-            price_ranges.append(
-                {
-                    "name": "Over $500",
-                    "min": 500,
-                    "max": None,
-                    "count": Product.objects.filter(price__gte=500).count(),
-                }
-            )
-    else:
-        price_ranges = [
-            {"name": "Under $100", "min": 0, "max": 99.99, "count": 0},
-            {"name": "$100 - $300", "min": 100, "max": 299.99, "count": 0},
-            {"name": "$300 - $500", "min": 300, "max": 499.99, "count": 0},
-            {"name": "Over $500", "min": 500, "max": None, "count": 0},
-        ]
-
-    return Response(
-        {
-            "brands": list(brands),
-            "connections": list(connections),
-            "types": [],
-            "price_ranges": price_ranges,
-        }
-    )
+    try:
+        facets = get_product_facets(request.GET)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(facets)
 
 
 @api_view(["POST"])
@@ -213,10 +232,12 @@ def delete_product_image(request, product_id):
 @api_view(["GET"])
 def check_product_stock(request, id):
     try:
-        product = Product.objects.get(id=id)
-        return Response(
-            {"status": "success", "data": {"id": product.id, "stock": product.stock}}
+        stock = (
+            Product.objects.annotate(available=available_stock())
+            .values_list("available", flat=True)
+            .get(id=id)
         )
+        return Response({"status": "success", "data": {"id": id, "stock": stock}})
     except Product.DoesNotExist:
         return Response(
             {"status": "error", "message": "Product not found"},
@@ -224,12 +245,123 @@ def check_product_stock(request, id):
         )
 
 
+@api_view(["GET"])
+def check_product_stock_batch(request):
+    """Stock for many products at once: ?ids=1,2,3"""
+    try:
+        ids = parse_id_list(request.GET)
+    except ValueError as e:
+        return Response(
+            {"status": "error", "message": str(e)},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    stock = dict(
+        Product.objects.filter(id__in=ids)
+        .annotate(available=available_stock())
+        .values_list("id", "available")
+    )
+    return Response(
+        {
+            "status": "success",
+            "data": {
+                str(product_id): {"id": product_id, "stock": stock[product_id]}
+                for product_id in ids
+                if product_id in stock
+            },
+            "missing": [product_id for product_id in ids if product_id not in stock],
+        }
+    )
+
+
+@api_view(["GET"])
+def get_products_batch(request):
+    """
+    Many products in one query, keyed by id: ?ids=1,2,3. Takes ``fields``
+    and ``exclude`` like the listing; ids that do not exist are returned
+    in ``missing``.
+    """
+    try:
+        ids = parse_id_list(request.GET)
+        fields = select_fields(request.GET, ProductReadSerializer.field_names())
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    columns = ProductReadSerializer.columns(fields)
+    rows = {
+        row["id"]: row
+        for row in ProductReadSerializer.annotate(
+            Product.objects.filter(id__in=ids), fields
+        ).values("id", *columns)
+    }
+    found = [product_id for product_id in ids if product_id in rows]
+    products = ProductReadSerializer(
+        [rows[product_id] for product_id in found], many=True, fields=fields
+    ).data
+    return Response(
+        {
+            "results": {
+                str(product_id): product for product_id, product in zip(found, products)
+            },
+            "missing": [product_id for product_id in ids if product_id not in rows],
+        }
+    )
+
+
 @api_view(["GET"])
 def get_recommended_products(request):
     """
-    Get recommended products based on popularity or featured status.
+    Products frequently bought together with ``product_id`` or, without it,
+    with the signed-in customer's recent purchases. Falls back to featured
+    products when there is no purchase history to go on.
     """
-    recommended_products = Product.objects.filter(is_featured=True)[:10]
-    serializer = ProductSerializer(recommended_products, many=True)
+    try:
+        fields = select_fields(request.GET, ProductReadSerializer.field_names())
+        product_id = request.GET.get("product_id")
+        if product_id:
+            if not product_id.isdigit():
+                raise ValueError("product_id must be an integer")
+            seeds = [int(product_id)]
+        elif request.user.is_authenticated:
+            seeds = recent_purchases(request.user)
+        else:
+            seeds = []
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    data = ProductReadSerializer(
+        recommended_products(seeds), many=True, fields=fields
+    ).data
+    if not data:
+        featured = Product.objects.filter(is_featured=True, is_active=True).exclude(
+            id__in=seeds
+        )[:10]
+        data = ProductReadSerializer(featured, many=True, fields=fields).data
+
+    return Response(data)
 
-    return Response(serializer.data)
+
+@api_view(["GET"])
+def get_similar_products(request, id):
+    """
+    Products most like this one by category, brand, connections, price band
+    and description, read from the precomputed similar products.
+    """
+    try:
+        fields = select_fields(request.GET, ProductReadSerializer.field_names())
+        limit = request.GET.get("limit", "10")
+        if not limit.isdigit():
+            raise ValueError("limit must be an integer")
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    data = ProductReadSerializer(
+        recommended_products([id], kind="similar", limit=int(limit)),
+        many=True,
+        fields=fields,
+    ).data
+    if not data and not Product.objects.filter(id=id).exists():
+        return Response(
+            {"error": "Product not found"}, status=status.HTTP_404_NOT_FOUND
+        )
+    return Response(data)
@@ -0,0 +1,67 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from server.models import Product
+from server.serializers import ProductReadSerializer, ProductSerializer
+
+
+class Command(BaseCommand):
+    help = "Compare ProductReadSerializer with ProductSerializer for parity and speed"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit", type=int, default=1000, help="Number of products per run"
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Runs per serializer, best is kept"
+        )
+
+    def _best_of(self, repeat, render):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            output = render()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, output
+
+    def handle(self, *args, **options):
+        # ProductReadSerializer reads the stock of sharded products from the
+        # shards, ProductSerializer the column; compare where they agree
+        products = Product.objects.filter(stock_shards=0).order_by("id")[
+            : options["limit"]
+        ]
+        renderer = JSONRenderer()
+
+        # Both timings include the query, as the endpoints do
+        model_time, model_json = self._best_of(
+            options["repeat"],
+            lambda: renderer.render(ProductSerializer(products.all(), many=True).data),
+        )
+        read_time, read_json = self._best_of(
+            options["repeat"],
+            lambda: renderer.render(
+                ProductReadSerializer(products.all(), many=True).data
+            ),
+        )
+
+        if json.loads(model_json) != json.loads(read_json):
+            raise CommandError(
+                "ProductReadSerializer output differs from ProductSerializer"
+            )
+        if model_json != read_json:
+            raise CommandError("Rendered JSON differs in key order or formatting")
+
+        count = len(json.loads(read_json))
+        self.stdout.write(f"Products serialized: {count}")
+        self.stdout.write(f"ProductSerializer:     {model_time * 1000:.1f} ms")
+        self.stdout.write(f"ProductReadSerializer: {read_time * 1000:.1f} ms")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Output identical, {model_time / read_time:.1f}x faster"
+                if read_time
+                else "Output identical"
+            )
+        )
@@ -0,0 +1,105 @@
+import threading
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from server.models import Product
+from server.services.inventory_service import available_stock, take_stock
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure checkout throughput on one hot product with plain and with "
+        "sharded stock. Creates a scratch product and deletes it afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--threads", type=int, default=16, help="Concurrent checkouts"
+        )
+        parser.add_argument("--orders", type=int, default=400, help="Checkouts per run")
+        parser.add_argument(
+            "--shards", type=int, default=8, help="Shards in the sharded run"
+        )
+        parser.add_argument(
+            "--hold-ms",
+            type=float,
+            default=5,
+            help="Time each checkout transaction stays open after taking stock, "
+            "standing in for the rest of create_order",
+        )
+
+    def _run(self, product, shards, options):
+        product = Product.objects.get(id=product.id)
+        product.stock_shards = shards
+        product.stock = options["orders"] * 2
+        product.save()
+
+        remaining = [options["orders"]]
+        lock = threading.Lock()
+        errors = []
+
+        def checkout():
+            try:
+                while True:
+                    with lock:
+                        if remaining[0] == 0:
+                            return
+                        remaining[0] -= 1
+                    with transaction.atomic():
+                        take_stock({product.id: 1})
+                        time.sleep(options["hold_ms"] / 1000)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=checkout) for _ in range(options["threads"])]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+
+        if errors:
+            raise CommandError(f"Checkout failed: {errors[0]}")
+        stock = (
+            Product.objects.annotate(available=available_stock())
+            .values_list("available", flat=True)
+            .get(id=product.id)
+        )
+        if stock != options["orders"]:
+            raise CommandError(
+                f"Stock is {stock} after the run, expected {options['orders']}"
+            )
+        return options["orders"] / elapsed
+
+    def handle(self, *args, **options):
+        product = Product.objects.create(
+            name="Stock contention benchmark",
+            slug=f"benchmark-{uuid.uuid4().hex[:12]}",
+            description="",
+            brand="Benchmark",
+            connections="",
+            price=Decimal("1.00"),
+            is_active=False,
+        )
+        try:
+            plain = self._run(product, 0, options)
+            sharded = self._run(product, options["shards"], options)
+        finally:
+            product.delete()
+
+        self.stdout.write(
+            f"{options['threads']} threads, {options['orders']} checkouts, "
+            f"{options['hold_ms']} ms per transaction"
+        )
+        self.stdout.write(f"{'Plain stock:':<20} {plain:.0f} checkouts/s")
+        self.stdout.write(
+            f"{str(options['shards']) + ' stock shards:':<20} {sharded:.0f} checkouts/s"
+        )
+        self.stdout.write(self.style.SUCCESS(f"{sharded / plain:.1f}x throughput"))
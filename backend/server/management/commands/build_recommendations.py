@@ -0,0 +1,73 @@
+from datetime import timedelta
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from server.models import OrderItem, ProductNeighbor
+from server.services.similarity_service import co_purchase_similarity
+
+
+class Command(BaseCommand):
+    help = "Rebuild the frequently-bought-together lists from order history"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--top", type=int, default=20, help="Neighbours kept per product"
+        )
+        parser.add_argument(
+            "--min-support",
+            type=int,
+            default=2,
+            help="Orders two products must share to be related",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=365,
+            help="Only use orders placed in the last DAYS days",
+        )
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(days=options["days"])
+        lines = (
+            OrderItem.objects.filter(order__created_at__gte=since)
+            .exclude(order__status="cancelled")
+            .values_list("order_id", "product_id")
+            .distinct()
+            .order_by()
+        )
+        pairs = np.fromiter(
+            (value for line in lines.iterator(chunk_size=5000) for value in line),
+            dtype=np.int64,
+        ).reshape(-1, 2)
+
+        products, neighbors, scores, ranks = co_purchase_similarity(
+            pairs[:, 0], pairs[:, 1], options["top"], options["min_support"]
+        )
+
+        with transaction.atomic():
+            ProductNeighbor.objects.filter(kind="co_purchase").delete()
+            ProductNeighbor.objects.bulk_create(
+                [
+                    ProductNeighbor(
+                        kind="co_purchase",
+                        product_id=int(product),
+                        neighbor_id=int(neighbor),
+                        score=float(score),
+                        rank=int(rank),
+                    )
+                    for product, neighbor, score, rank in zip(
+                        products, neighbors, scores, ranks
+                    )
+                ],
+                batch_size=2000,
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Stored {len(products)} neighbours for "
+                f"{len(np.unique(products))} products from {len(pairs)} order lines"
+            )
+        )
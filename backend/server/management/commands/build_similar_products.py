@@ -0,0 +1,127 @@
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Max, Min
+from django.utils import timezone
+
+from server.models import Product, ProductNeighbor
+from server.services.similarity_service import product_features, top_k_similar
+from server.services.suggest_service import WATERMARK_SKEW
+
+FEATURE_COLUMNS = (
+    "category_id",
+    "brand",
+    "connections",
+    "price",
+    "sale_price",
+    "description",
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Refresh the content-based similar products of every product changed "
+        "since the last run, or of the whole catalog with --full"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--top", type=int, default=12, help="Similar products kept per product"
+        )
+        parser.add_argument(
+            "--full", action="store_true", help="Recompute every product"
+        )
+        parser.add_argument(
+            "--product",
+            type=int,
+            action="append",
+            default=[],
+            help="Refresh this product (repeatable)",
+        )
+
+    def handle(self, *args, **options):
+        top = options["top"]
+        started = timezone.now()
+        stored = ProductNeighbor.objects.filter(kind="similar")
+        rows = list(
+            Product.objects.filter(is_active=True)
+            .order_by("id")
+            .values_list("id", *FEATURE_COLUMNS)
+        )
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        features = product_features([row[1:] for row in rows])
+
+        watermark = stored.aggregate(latest=Max("computed_at"))["latest"]
+        if options["full"] or (watermark is None and not options["product"]):
+            affected = np.arange(len(ids))
+            removed = []
+            self.stdout.write(f"Computing similar products for {len(ids)} products")
+        else:
+            changed = set(options["product"])
+            if watermark is not None and not options["product"]:
+                changed.update(
+                    Product.objects.filter(
+                        updated_at__gte=watermark - WATERMARK_SKEW
+                    ).values_list("id", flat=True)
+                )
+            affected, removed = self.affected_rows(stored, ids, features, changed, top)
+            self.stdout.write(
+                f"{len(changed)} changed products, refreshing {len(affected)}"
+            )
+
+        rows, neighbors, scores, ranks = top_k_similar(features, affected, top)
+        with transaction.atomic():
+            stored.filter(product_id__in=[*ids[affected].tolist(), *removed]).delete()
+            ProductNeighbor.objects.bulk_create(
+                [
+                    ProductNeighbor(
+                        kind="similar",
+                        product_id=int(ids[row]),
+                        neighbor_id=int(ids[neighbor]),
+                        score=float(score),
+                        rank=int(rank),
+                        computed_at=started,
+                    )
+                    for row, neighbor, score, rank in zip(
+                        rows, neighbors, scores, ranks
+                    )
+                ],
+                batch_size=2000,
+            )
+        self.stdout.write(self.style.SUCCESS(f"Stored {len(rows)} similar products"))
+
+    def affected_rows(self, stored, ids, features, changed, top):
+        """
+        Rows whose list can differ after ``changed`` products moved: the
+        changed products themselves, products listing one of them, and
+        products a changed product now outranks their last neighbour for.
+        Also returns the changed ids that are no longer active.
+        """
+        position = {product_id: row for row, product_id in enumerate(ids.tolist())}
+        changed_rows = np.array(
+            sorted(position[i] for i in changed if i in position), dtype=np.int64
+        )
+        removed = [i for i in changed if i not in position]
+
+        affected = set(changed_rows.tolist())
+        listing = stored.filter(neighbor_id__in=changed).values_list(
+            "product_id", flat=True
+        )
+        affected.update(position[i] for i in listing if i in position)
+
+        # Score a product must reach to enter a list: its lowest stored score
+        # when the list is full, anything positive otherwise
+        threshold = np.full(len(ids), 1e-6, dtype=np.float32)
+        lists = stored.values("product_id").annotate(
+            count=Count("id"), lowest=Min("score")
+        )
+        for row in lists:
+            if row["count"] >= top and row["product_id"] in position:
+                threshold[position[row["product_id"]]] = row["lowest"]
+        for start in range(0, len(changed_rows), 512):
+            block = changed_rows[start : start + 512]
+            scores = features @ features[block].T
+            scores[block, np.arange(len(block))] = 0
+            affected.update(np.flatnonzero(scores.max(axis=1) >= threshold).tolist())
+
+        return np.array(sorted(affected), dtype=np.int64), removed
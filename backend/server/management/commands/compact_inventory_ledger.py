@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F
+
+from server.models import Product
+from server.services.inventory_service import (
+    COMPACTION_BATCH_SIZE,
+    available_stock,
+    compact_inventory_ledger,
+    ledger_stock,
+)
+
+
+class Command(BaseCommand):
+    help = "Fold inventory ledger movements into the per-product stock snapshots"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=COMPACTION_BATCH_SIZE,
+            help="Products folded per transaction",
+        )
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Also compare the ledger stock with the live stock",
+        )
+
+    def handle(self, *args, **options):
+        compacted = compact_inventory_ledger(options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Compacted the ledger of {compacted} products")
+        )
+        if not options["verify"]:
+            return
+
+        drift = list(
+            Product.objects.annotate(ledger=ledger_stock(), available=available_stock())
+            .exclude(ledger=F("available"))
+            .order_by("id")
+            .values_list("id", "ledger", "available")
+        )
+        for product_id, ledger, available in drift[:20]:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Product {product_id}: ledger {ledger}, stock {available}"
+                )
+            )
+        if drift:
+            raise CommandError(f"{len(drift)} products differ from the ledger")
+        self.stdout.write(self.style.SUCCESS("Ledger matches the stock"))
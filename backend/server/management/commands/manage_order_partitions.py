@@ -0,0 +1,107 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from server.services.partition_service import (
+    PARTITIONED_MODELS,
+    add_months,
+    archive_month,
+    create_partition,
+    default_months,
+    is_partitioned,
+    month_start,
+    monthly_partitions,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the coming monthly partitions of orders and order items, "
+        "and archive the partitions of old months"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ahead",
+            type=int,
+            default=3,
+            help="Months after the current one to have partitions for",
+        )
+        parser.add_argument(
+            "--archive-after",
+            type=int,
+            help="Archive months that ended more than this many months ago",
+        )
+        parser.add_argument(
+            "--archive-dir",
+            default="order_archive",
+            help="Directory the archived partitions are exported to",
+        )
+        parser.add_argument(
+            "--detach-only",
+            action="store_true",
+            help="Detach old partitions and keep them as plain tables instead "
+            "of exporting and dropping them",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report what would be created and archived",
+        )
+
+    def handle(self, *args, **options):
+        tables = [model._meta.db_table for model in PARTITIONED_MODELS]
+        if not all(is_partitioned(table) for table in tables):
+            raise CommandError(
+                "Orders are not partitioned; set ORDER_PARTITIONING and migrate"
+            )
+        if options["ahead"] < 0:
+            raise CommandError("--ahead must not be negative")
+        dry_run = options["dry_run"]
+        current = month_start(timezone.now())
+
+        for table in tables:
+            existing = monthly_partitions(table)
+            # Months outside the partitions so far went to the default one
+            months = default_months(table)
+            months += [add_months(current, n) for n in range(options["ahead"] + 1)]
+            for month in sorted(set(months)):
+                if month in existing:
+                    continue
+                if dry_run:
+                    self.stdout.write(f"Would create {table} {month:%Y-%m}")
+                    continue
+                name = create_partition(table, month)
+                self.stdout.write(self.style.SUCCESS(f"Created partition {name}"))
+
+        if options["archive_after"] is None:
+            return
+        if options["archive_after"] < 1:
+            raise CommandError("--archive-after must be at least 1")
+        cutoff = add_months(current, -options["archive_after"])
+        months = sorted(
+            {
+                month
+                for table in tables
+                for month in monthly_partitions(table)
+                if month < cutoff
+            }
+        )
+        directory = None
+        if not options["detach_only"]:
+            directory = Path(options["archive_dir"])
+            if not dry_run:
+                directory.mkdir(parents=True, exist_ok=True)
+        for month in months:
+            if dry_run:
+                self.stdout.write(f"Would archive {month:%Y-%m}")
+                continue
+            for name in archive_month(month, directory):
+                self.stdout.write(
+                    f"Detached {name}"
+                    if directory is None
+                    else f"Archived {name} to {directory / name}.csv.gz"
+                )
+        if not dry_run:
+            self.stdout.write(self.style.SUCCESS(f"Archived {len(months)} months"))
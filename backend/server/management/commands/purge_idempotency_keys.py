@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from server.services.idempotency_service import (
+    PURGE_BATCH_SIZE,
+    purge_idempotency_keys,
+    purge_used_quotes,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete stored Idempotency-Key responses and used order quotes "
+        "that have expired"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=PURGE_BATCH_SIZE,
+            help="Keys deleted per statement",
+        )
+
+    def handle(self, *args, **options):
+        deleted = purge_idempotency_keys(options["batch_size"])
+        quotes = purge_used_quotes(options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Purged {deleted} idempotency keys and {quotes} used quotes"
+            )
+        )
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from server.models import Product
+from server.services.inventory_service import rebalance_stock_shards
+
+
+class Command(BaseCommand):
+    help = (
+        "Even out the stock shards of products with sharded inventory and "
+        "refresh their cached Product.stock"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--product",
+            type=int,
+            action="append",
+            default=[],
+            help="Only rebalance this product (repeatable)",
+        )
+
+    def handle(self, *args, **options):
+        # Include products that had sharding turned off but still have shards
+        products = Product.objects.filter(
+            Q(stock_shards__gt=0) | Q(stock_shard_rows__isnull=False)
+        ).distinct()
+        if options["product"]:
+            products = products.filter(id__in=options["product"])
+
+        ids = list(products.order_by("id").values_list("id", flat=True))
+        for product_id in ids:
+            rebalance_stock_shards(product_id)
+        self.stdout.write(self.style.SUCCESS(f"Rebalanced {len(ids)} products"))
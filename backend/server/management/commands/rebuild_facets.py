@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from server.services.facet_store_service import (
+    expected_facet_counts,
+    facet_count_drift,
+    rebuild_facet_counts,
+    stored_facet_counts,
+)
+
+
+class Command(BaseCommand):
+    help = "Rebuild the product facet counts and verify them against the catalog"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report drift between stored and actual counts",
+        )
+
+    def handle(self, *args, **options):
+        drift = facet_count_drift(expected_facet_counts(), stored_facet_counts())
+        for (facet, value, category_key, is_active), (expected, stored) in sorted(
+            drift.items()
+        )[:20]:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{facet}={value} (category {category_key}, active {is_active}): "
+                    f"expected {expected}, stored {stored}"
+                )
+            )
+
+        if options["check"]:
+            if drift:
+                raise CommandError(f"{len(drift)} facet counts are out of date")
+            self.stdout.write(self.style.SUCCESS("Facet counts are up to date"))
+            return
+
+        expected = rebuild_facet_counts()
+        drift = facet_count_drift(expected, stored_facet_counts())
+        if drift:
+            raise CommandError(f"{len(drift)} facet counts differ after rebuild")
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(expected)} facet counts"))
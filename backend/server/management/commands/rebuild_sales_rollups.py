@@ -0,0 +1,80 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from server.models import Order
+from server.services.sales_rollup_service import (
+    expected_sales_rollups,
+    rebuild_sales_rollups,
+    sales_rollup_drift,
+    stored_sales_rollups,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Backfill or repair the daily sales rollups from the orders, "
+        "by default over every day with orders"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, help="Only the last N days")
+        parser.add_argument("--from", dest="start", help="First day, YYYY-MM-DD")
+        parser.add_argument("--to", dest="end", help="Last day, YYYY-MM-DD")
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report drift between stored and actual rollups",
+        )
+
+    def _day(self, value, name):
+        try:
+            day = parse_date(value)
+        except ValueError:
+            day = None
+        if day is None:
+            raise CommandError(f"Invalid date for --{name}: {value}")
+        return day
+
+    def handle(self, *args, **options):
+        end = timezone.localdate()
+        if options["end"]:
+            end = self._day(options["end"], "to")
+        if options["start"]:
+            start = self._day(options["start"], "from")
+        elif options["days"]:
+            start = end - timedelta(days=options["days"] - 1)
+        else:
+            # Days before the oldest order (e.g. archived months) keep
+            # their rollups
+            oldest = Order.objects.aggregate(oldest=Min("created_at"))["oldest"]
+            start = timezone.localdate(oldest) if oldest else end
+        if start > end:
+            raise CommandError("The first day is after the last day")
+
+        drift = sales_rollup_drift(
+            expected_sales_rollups(start, end), stored_sales_rollups(start, end)
+        )
+        for table, key, expected, stored in drift[:20]:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{table} {key}: expected {expected}, stored {stored}"
+                )
+            )
+
+        if options["check"]:
+            if drift:
+                raise CommandError(f"{len(drift)} sales rollup rows are out of date")
+            self.stdout.write(self.style.SUCCESS("Sales rollups are up to date"))
+            return
+
+        rebuild_sales_rollups(start, end)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt the sales rollups from {start} to {end}, "
+                f"{len(drift)} rows were out of date"
+            )
+        )
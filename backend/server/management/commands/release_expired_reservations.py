@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from server.services.inventory_service import (
+    SWEEP_BATCH_SIZE,
+    release_expired_reservations,
+)
+
+
+class Command(BaseCommand):
+    help = "Return the stock held by unpaid orders whose reservation expired"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=SWEEP_BATCH_SIZE,
+            help="Reservations released per transaction",
+        )
+
+    def handle(self, *args, **options):
+        released = release_expired_reservations(options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Released {released} expired stock reservations")
+        )
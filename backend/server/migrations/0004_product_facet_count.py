@@ -0,0 +1,49 @@
+# Generated by Django 5.1.4 on 2026-10-18 08:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("server", "0003_product_listing_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductFacetCount",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "facet",
+                    models.CharField(
+                        choices=[
+                            ("brand", "Brand"),
+                            ("connection", "Connection"),
+                            ("price", "Price range"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("value", models.CharField(max_length=255)),
+                ("category_key", models.PositiveIntegerField(default=0)),
+                ("is_active", models.BooleanField()),
+                ("count", models.IntegerField(default=0)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("facet", "value", "category_key", "is_active"),
+                        name="unique_product_facet_count",
+                    )
+                ],
+            },
+        ),
+    ]
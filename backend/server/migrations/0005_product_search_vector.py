@@ -0,0 +1,55 @@
+# Generated by Django 5.1.4 on 2026-10-18 08:45
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Name, brand, connections and description weighted A to D, so ts_rank
+# favours hits in the product name.
+SEARCH_VECTOR_SQL = """
+CREATE FUNCTION server_product_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(NEW.brand, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(NEW.connections, '')), 'C') ||
+        setweight(to_tsvector('english', coalesce(NEW.description, '')), 'D');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER server_product_search_vector
+    BEFORE INSERT OR UPDATE OF name, brand, connections, description
+    ON server_product
+    FOR EACH ROW EXECUTE FUNCTION server_product_search_vector_update();
+
+UPDATE server_product SET name = name;
+"""
+
+DROP_SEARCH_VECTOR_SQL = """
+DROP TRIGGER IF EXISTS server_product_search_vector ON server_product;
+DROP FUNCTION IF EXISTS server_product_search_vector_update();
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("server", "0004_product_facet_count"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunSQL(SEARCH_VECTOR_SQL, DROP_SEARCH_VECTOR_SQL),
+        migrations.AddIndex(
+            model_name="product",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="product_search_vector_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,113 @@
+# Generated by Django 5.1.4 on 2026-10-18 08:48
+
+from collections import Counter
+
+from django.db import migrations, models
+
+
+def _connection_keys(connections):
+    """{key: name} of the connection types in a Product.connections string"""
+    keys = {}
+    for name in (connections or "").split(","):
+        name = " ".join(name.split())
+        if name:
+            keys.setdefault(name.lower(), name)
+    return keys
+
+
+def parse_connections(apps, schema_editor):
+    Product = apps.get_model("server", "Product")
+    ConnectionType = apps.get_model("server", "ConnectionType")
+    Through = Product.connection_types.through
+
+    product_keys = {}
+    names = {}
+    for product_id, connections in Product.objects.values_list("id", "connections"):
+        keys = _connection_keys(connections)
+        for key, name in keys.items():
+            names.setdefault(key, name)
+        product_keys[product_id] = set(keys)
+
+    ConnectionType.objects.bulk_create(
+        [ConnectionType(key=key, name=name) for key, name in names.items()],
+        ignore_conflicts=True,
+    )
+    type_ids = dict(ConnectionType.objects.values_list("key", "id"))
+    Through.objects.bulk_create(
+        [
+            Through(product_id=product_id, connectiontype_id=type_ids[key])
+            for product_id, keys in product_keys.items()
+            for key in keys
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+def recount_connection_facets(apps, schema_editor):
+    """
+    Stored connection facet rows are keyed by connection type key from now
+    on: replace the rows keyed by the raw strings with a fresh count. A
+    facet store that was never built is left for ``rebuild_facets``.
+    """
+    Product = apps.get_model("server", "Product")
+    ProductFacetCount = apps.get_model("server", "ProductFacetCount")
+    if not ProductFacetCount.objects.exists():
+        return
+
+    counts = Counter()
+    rows = Product.objects.values_list("connections", "category_id", "is_active")
+    for connections, category_id, is_active in rows.iterator(chunk_size=2000):
+        for key in _connection_keys(connections):
+            counts[(key, category_id or 0, bool(is_active))] += 1
+    ProductFacetCount.objects.filter(facet="connection").delete()
+    ProductFacetCount.objects.bulk_create(
+        [
+            ProductFacetCount(
+                facet="connection",
+                value=key,
+                category_key=category_key,
+                is_active=is_active,
+                count=count,
+            )
+            for (key, category_key, is_active), count in counts.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("server", "0006_product_name_trigram"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ConnectionType",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255)),
+                ("key", models.CharField(max_length=255, unique=True)),
+            ],
+            options={
+                "ordering": ["name"],
+            },
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="connection_types",
+            field=models.ManyToManyField(
+                blank=True, related_name="products", to="server.connectiontype"
+            ),
+        ),
+        migrations.RunPython(parse_connections, migrations.RunPython.noop),
+        migrations.RunPython(recount_connection_facets, migrations.RunPython.noop),
+    ]
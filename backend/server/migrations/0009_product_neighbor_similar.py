@@ -0,0 +1,29 @@
+# Generated by Django 5.1.4 on 2026-10-18 08:56
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("server", "0008_product_neighbor"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="productneighbor",
+            name="computed_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name="productneighbor",
+            name="kind",
+            field=models.CharField(
+                choices=[
+                    ("co_purchase", "Frequently bought together"),
+                    ("similar", "Similar products"),
+                ],
+                max_length=20,
+            ),
+        ),
+    ]
@@ -0,0 +1,107 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def open_snapshots(apps, schema_editor):
+    """Start every product's ledger at its current stock"""
+    Product = apps.get_model("server", "Product")
+    ProductStockShard = apps.get_model("server", "ProductStockShard")
+    InventorySnapshot = apps.get_model("server", "InventorySnapshot")
+
+    shard_totals = {}
+    for product_id, stock in ProductStockShard.objects.values_list(
+        "product_id", "stock"
+    ):
+        shard_totals[product_id] = shard_totals.get(product_id, 0) + stock
+    InventorySnapshot.objects.bulk_create(
+        [
+            InventorySnapshot(
+                product_id=product_id, stock=shard_totals.get(product_id, stock)
+            )
+            for product_id, stock in Product.objects.values_list("id", "stock")
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("server", "0011_product_stock_shard"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="InventorySnapshot",
+            fields=[
+                (
+                    "product",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="inventory_snapshot",
+                        serialize=False,
+                        to="server.product",
+                    ),
+                ),
+                ("stock", models.IntegerField(default=0)),
+                ("movement_id", models.BigIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="InventoryMovement",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("sale", "Sale"),
+                            ("restock", "Restock"),
+                            ("adjustment", "Adjustment"),
+                            ("release", "Reservation release"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("quantity", models.IntegerField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "order",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="inventory_movements",
+                        to="server.order",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="inventory_movements",
+                        to="server.product",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["product", "id"], name="inventory_movement_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(open_snapshots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,99 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:09
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+SUMMARY_ITEMS = 3
+SUMMARY_LENGTH = 255
+
+
+def summarize(lines):
+    # Frozen copy of services.order_service.order_summary
+    named = [f"{quantity}x {name}" for name, quantity in lines[:SUMMARY_ITEMS]]
+    summary = ", ".join(named)
+    if len(lines) > SUMMARY_ITEMS:
+        summary += f" and {len(lines) - SUMMARY_ITEMS} more"
+    if len(summary) > SUMMARY_LENGTH:
+        summary = summary[: SUMMARY_LENGTH - 3] + "..."
+    return summary
+
+
+def backfill_snapshots(apps, schema_editor):
+    """Copy the current product details onto existing items and orders"""
+    Order = apps.get_model("server", "Order")
+    OrderItem = apps.get_model("server", "OrderItem")
+    Product = apps.get_model("server", "Product")
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {OrderItem._meta.db_table} AS item
+            SET product_name = product.name,
+                product_sku = product.slug,
+                product_image = product.image_url
+            FROM {Product._meta.db_table} AS product
+            WHERE product.id = item.product_id
+            """
+        )
+
+    last_id = 0
+    while True:
+        order_ids = list(
+            Order.objects.filter(id__gt=last_id)
+            .order_by("id")
+            .values_list("id", flat=True)[:BATCH_SIZE]
+        )
+        if not order_ids:
+            break
+        lines = {order_id: [] for order_id in order_ids}
+        for order_id, name, quantity in (
+            OrderItem.objects.filter(order_id__in=order_ids)
+            .order_by("order_id", "id")
+            .values_list("order_id", "product_name", "quantity")
+        ):
+            lines[order_id].append((name, quantity))
+        orders = [
+            Order(
+                id=order_id,
+                item_count=sum(quantity for _name, quantity in items),
+                summary=summarize(items),
+            )
+            for order_id, items in lines.items()
+        ]
+        Order.objects.bulk_update(orders, ["item_count", "summary"])
+        last_id = order_ids[-1]
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("server", "0015_order_console_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="item_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="summary",
+            field=models.CharField(blank=True, default="", max_length=255),
+        ),
+        migrations.AddField(
+            model_name="orderitem",
+            name="product_image",
+            field=models.CharField(blank=True, max_length=500, null=True),
+        ),
+        migrations.AddField(
+            model_name="orderitem",
+            name="product_name",
+            field=models.CharField(default="", max_length=255),
+        ),
+        migrations.AddField(
+            model_name="orderitem",
+            name="product_sku",
+            field=models.CharField(default="", max_length=50),
+        ),
+        migrations.RunPython(backfill_snapshots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,170 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:12
+
+from datetime import date
+
+from django.conf import settings
+from django.db import migrations
+from django.utils import timezone
+
+MONTHS_AHEAD = 3
+
+
+def _next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _bound(month):
+    return f"'{month.isoformat()} 00:00:00+00'"
+
+
+def _partition_table(cursor, table):
+    """
+    Rebuild ``table`` as a table range partitioned by month of created_at.
+
+    Unique keys have to include the partition key, so the primary key
+    becomes (id, created_at), other unique keys gain created_at, and
+    foreign keys pointing at the table are dropped; Django still applies
+    on_delete itself.
+    """
+    cursor.execute(
+        """
+        SELECT indexdef FROM pg_indexes
+        WHERE schemaname = current_schema() AND tablename = %s
+          AND indexname NOT IN (
+              SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass
+          )
+        """,
+        [table, table],
+    )
+    indexes = [row[0] for row in cursor.fetchall()]
+    cursor.execute(
+        """
+        SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = %s::regclass AND contype = 'f'
+        """,
+        [table],
+    )
+    foreign_keys = cursor.fetchall()
+    cursor.execute(
+        """
+        SELECT array_agg(attribute.attname ORDER BY key.position)
+        FROM pg_constraint constraint_
+        CROSS JOIN unnest(constraint_.conkey) WITH ORDINALITY AS key(attnum, position)
+        JOIN pg_attribute attribute
+          ON attribute.attrelid = constraint_.conrelid
+         AND attribute.attnum = key.attnum
+        WHERE constraint_.conrelid = %s::regclass AND constraint_.contype = 'u'
+        GROUP BY constraint_.oid
+        """,
+        [table],
+    )
+    unique_keys = [row[0] for row in cursor.fetchall()]
+    cursor.execute(f"SELECT min(created_at) FROM {table}")
+    oldest = cursor.fetchone()[0] or timezone.now()
+
+    new = f"{table}_new"
+    cursor.execute(
+        f"CREATE TABLE {new} (LIKE {table} INCLUDING DEFAULTS INCLUDING IDENTITY "
+        f"INCLUDING CONSTRAINTS) PARTITION BY RANGE (created_at)"
+    )
+    cursor.execute(f"ALTER TABLE {new} ADD PRIMARY KEY (id, created_at)")
+    for columns in unique_keys:
+        cursor.execute(
+            f"ALTER TABLE {new} ADD CONSTRAINT {table}_{'_'.join(columns)}_month_key "
+            f"UNIQUE ({', '.join(columns)}, created_at)"
+        )
+    cursor.execute(f"CREATE TABLE {table}_default PARTITION OF {new} DEFAULT")
+    month = date(oldest.year, oldest.month, 1)
+    last = timezone.now().date().replace(day=1)
+    for _ in range(MONTHS_AHEAD):
+        last = _next_month(last)
+    while month <= last:
+        cursor.execute(
+            f"CREATE TABLE {table}_p{month:%Y_%m} PARTITION OF {new} "
+            f"FOR VALUES FROM ({_bound(month)}) TO ({_bound(_next_month(month))})"
+        )
+        month = _next_month(month)
+    cursor.execute(f"INSERT INTO {new} SELECT * FROM {table}")
+
+    cursor.execute(f"DROP TABLE {table} CASCADE")
+    cursor.execute(f"ALTER TABLE {new} RENAME TO {table}")
+    cursor.execute(f"ALTER TABLE {table} RENAME CONSTRAINT {new}_pkey TO {table}_pkey")
+    cursor.execute(f"ALTER SEQUENCE {new}_id_seq RENAME TO {table}_id_seq")
+    cursor.execute(
+        f"SELECT setval('{table}_id_seq', coalesce(max(id), 0) + 1, false) FROM {table}"
+    )
+    for indexdef in indexes:
+        cursor.execute(indexdef)
+    for name, definition in foreign_keys:
+        cursor.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}")
+
+
+def _claim_order_numbers(cursor, table):
+    """
+    Keep order numbers unique across the partitions, which the (order_number,
+    created_at) key of a partitioned table no longer does: every number is
+    claimed in a plain table by a trigger. Numbers stay claimed after their
+    order is archived, so they are never handed out twice.
+    """
+    cursor.execute(
+        f"CREATE TABLE {table}_number (order_number varchar(20) PRIMARY KEY)"
+    )
+    cursor.execute(
+        f"INSERT INTO {table}_number SELECT DISTINCT order_number FROM {table}"
+    )
+    cursor.execute(
+        f"""
+        CREATE FUNCTION {table}_number_claim() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'UPDATE' THEN
+                IF NEW.order_number = OLD.order_number THEN
+                    RETURN NEW;
+                END IF;
+                DELETE FROM {table}_number WHERE order_number = OLD.order_number;
+            END IF;
+            INSERT INTO {table}_number (order_number) VALUES (NEW.order_number);
+            RETURN NEW;
+        END
+        $$
+        """
+    )
+    cursor.execute(
+        f"CREATE TRIGGER {table}_number_claim "
+        f"BEFORE INSERT OR UPDATE OF order_number ON {table} "
+        f"FOR EACH ROW EXECUTE FUNCTION {table}_number_claim()"
+    )
+
+
+def partition_orders(apps, schema_editor):
+    """Partition orders and their items by month when ORDER_PARTITIONING is on"""
+    if not settings.ORDER_PARTITIONING:
+        return
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    Order = apps.get_model("server", "Order")
+    OrderItem = apps.get_model("server", "OrderItem")
+    orders, items = Order._meta.db_table, OrderItem._meta.db_table
+    with schema_editor.connection.cursor() as cursor:
+        # Items are partitioned by the created_at of their order, so that
+        # an order and its items are archived together
+        cursor.execute(
+            f"UPDATE {items} SET created_at = {orders}.created_at FROM {orders} "
+            f"WHERE {orders}.id = {items}.order_id "
+            f"AND {items}.created_at <> {orders}.created_at"
+        )
+        # Orders first: dropping the old table also drops the item foreign
+        # key, which a partitioned orders table could not be referenced by
+        _partition_table(cursor, orders)
+        _claim_order_numbers(cursor, orders)
+        _partition_table(cursor, items)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("server", "0016_order_item_snapshot"),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_orders, migrations.RunPython.noop),
+    ]
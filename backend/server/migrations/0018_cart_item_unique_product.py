@@ -0,0 +1,36 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:20
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_lines(apps, schema_editor):
+    """Fold repeated cart lines of a product into the first one"""
+    CartItem = apps.get_model("server", "CartItem")
+    duplicates = (
+        CartItem.objects.values("cart_id", "product_id")
+        .annotate(lines=Count("id"), first=Min("id"), total=Sum("quantity"))
+        .filter(lines__gt=1)
+    )
+    for line in duplicates:
+        rows = CartItem.objects.filter(
+            cart_id=line["cart_id"], product_id=line["product_id"]
+        )
+        rows.filter(id=line["first"]).update(quantity=line["total"])
+        rows.exclude(id=line["first"]).delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("server", "0017_order_partitioning"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_lines, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="cartitem",
+            constraint=models.UniqueConstraint(
+                fields=("cart", "product"), name="cart_item_unique_product"
+            ),
+        ),
+    ]
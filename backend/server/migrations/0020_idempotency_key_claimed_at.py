@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:27
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("server", "0019_daily_sales_rollups"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="idempotencykey",
+            name="claimed_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:35
+
+from collections import Counter
+
+from django.db import migrations, models
+
+
+def count_price_points(apps, schema_editor):
+    """
+    Add the price point rows to a facet store that is already built, so
+    that the stored facets have price bounds without a rebuild_facets run
+    """
+    Product = apps.get_model("server", "Product")
+    ProductFacetCount = apps.get_model("server", "ProductFacetCount")
+    if not ProductFacetCount.objects.exists():
+        return
+
+    counts = Counter()
+    rows = Product.objects.values_list(
+        "price", "sale_price", "category_id", "is_active"
+    )
+    for price, sale_price, category_id, is_active in rows.iterator(chunk_size=2000):
+        effective = sale_price if sale_price is not None else price
+        if effective is not None:
+            key = (f"{effective:011.2f}", category_id or 0, bool(is_active))
+            counts[key] += 1
+    ProductFacetCount.objects.filter(facet="price_point").delete()
+    ProductFacetCount.objects.bulk_create(
+        [
+            ProductFacetCount(
+                facet="price_point",
+                value=value,
+                category_key=category_key,
+                is_active=is_active,
+                count=count,
+            )
+            for (value, category_key, is_active), count in counts.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("server", "0021_order_item_created_at_default"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="productfacetcount",
+            name="facet",
+            field=models.CharField(
+                choices=[
+                    ("brand", "Brand"),
+                    ("connection", "Connection"),
+                    ("price", "Price range"),
+                    ("price_point", "Price"),
+                ],
+                max_length=20,
+            ),
+        ),
+        migrations.RunPython(count_price_points, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:49
+
+from django.db import migrations, models
+
+
+def backfill_category_keys(apps, schema_editor):
+    """
+    Copy the products' current category onto existing items, the category
+    the sales rollups counted them in so far
+    """
+    OrderItem = apps.get_model("server", "OrderItem")
+    Product = apps.get_model("server", "Product")
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {OrderItem._meta.db_table} AS item
+            SET category_key = product.category_id
+            FROM {Product._meta.db_table} AS product
+            WHERE product.id = item.product_id
+              AND product.category_id IS NOT NULL
+            """
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("server", "0022_product_facet_price_point"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="orderitem",
+            name="category_key",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_category_keys, migrations.RunPython.noop),
+    ]
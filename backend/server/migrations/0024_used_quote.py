@@ -0,0 +1,65 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# IdempotencyKey scope the used quotes were kept under before
+QUOTE_SCOPE = "order quote"
+
+
+def move_used_quotes(apps, schema_editor):
+    """Move the quotes still unexpired out of the IdempotencyKey table"""
+    IdempotencyKey = apps.get_model("server", "IdempotencyKey")
+    UsedQuote = apps.get_model("server", "UsedQuote")
+
+    used = IdempotencyKey.objects.filter(scope=QUOTE_SCOPE)
+    UsedQuote.objects.bulk_create(
+        [
+            UsedQuote(user_id=user_id, digest=key, expires_at=expires_at)
+            for user_id, key, expires_at in used.values_list(
+                "user_id", "key", "expires_at"
+            ).iterator()
+        ],
+        ignore_conflicts=True,
+    )
+    used.delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("server", "0023_order_item_category_key"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UsedQuote",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("digest", models.CharField(max_length=64, unique=True)),
+                ("used_at", models.DateTimeField(auto_now_add=True)),
+                ("expires_at", models.DateTimeField()),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="used_quotes",
+                        to="server.user",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["expires_at"], name="used_quote_expiry_idx")
+                ],
+            },
+        ),
+        migrations.RunPython(move_used_quotes, migrations.RunPython.noop),
+    ]
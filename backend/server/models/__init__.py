@@ -2,6 +2,17 @@ from .product_model import Product
 from .user_model import User, Customer, AdminStaff
 from .category_model import Category
 from .auth_model import Token
+from .facet_model import ProductFacetCount
+from .connection_model import ConnectionType
+from .recommendation_model import ProductNeighbor
+from .inventory_model import (
+    StockReservation,
+    ProductStockShard,
+    InventoryMovement,
+    InventorySnapshot,
+)
+from .idempotency_model import IdempotencyKey, UsedQuote
+from .sales_model import DailySales, DailyCategorySales, DailyProductSales
 from .ecommerce_model import (
     Order,
     OrderItem,
@@ -20,4 +31,16 @@ __all__ = [
     "OrderItem",
     "Cart",
     "CartItem",
+    "ProductFacetCount",
+    "ConnectionType",
+    "ProductNeighbor",
+    "StockReservation",
+    "ProductStockShard",
+    "InventoryMovement",
+    "InventorySnapshot",
+    "IdempotencyKey",
+    "UsedQuote",
+    "DailySales",
+    "DailyCategorySales",
+    "DailyProductSales",
 ]
@@ -0,0 +1,18 @@
+from django.db import models
+
+
+class ConnectionType(models.Model):
+    """
+    A single connection such as "Bluetooth 5.0", parsed out of the comma
+    separated Product.connections. ``key`` is the case and whitespace
+    insensitive form that filters and facet counts match on.
+    """
+
+    name = models.CharField(max_length=255)
+    key = models.CharField(max_length=255, unique=True)
+
+    class Meta:
+        ordering = ["name"]
+
+    def __str__(self):
+        return self.name
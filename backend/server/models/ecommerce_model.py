@@ -1,5 +1,6 @@
 from django.db import models
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 from decimal import Decimal
 
 
@@ -11,6 +12,14 @@ class Order(models.Model):
         ("delivered", "Delivered"),
         ("cancelled", "Cancelled"),
     ]
+    # Statuses an order may move to from each status
+    STATUS_TRANSITIONS = {
+        "pending": ("processing", "cancelled"),
+        "processing": ("shipped", "cancelled"),
+        "shipped": ("delivered",),
+        "delivered": (),
+        "cancelled": (),
+    }
 
     user = models.ForeignKey("User", on_delete=models.CASCADE, related_name="orders")
     order_number = models.CharField(max_length=20, unique=True)
@@ -23,9 +32,32 @@ class Order(models.Model):
     payment_status = models.BooleanField(default=False)
     payment_method = models.CharField(max_length=50, blank=True, null=True)
     payment_date = models.DateTimeField(blank=True, null=True)
+    # Units ordered and a one line description of the items, kept so that
+    # order listings need not read the items
+    item_count = models.PositiveIntegerField(default=0)
+    summary = models.CharField(max_length=255, blank=True, default="")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Customer order history, newest first and keyset paginated
+            models.Index(
+                fields=["user", "-created_at", "-id"], name="order_user_created_idx"
+            ),
+            # Staff order console: default sort, status filter and
+            # order number prefix search
+            models.Index(fields=["created_at", "id"], name="order_created_id_idx"),
+            models.Index(
+                fields=["status", "created_at", "id"], name="order_status_created_idx"
+            ),
+            models.Index(
+                fields=["order_number"],
+                opclasses=["varchar_pattern_ops"],
+                name="order_number_prefix_idx",
+            ),
+        ]
+
     def __str__(self):
         return f"Order {self.order_number} ({self.status})"
 
@@ -35,10 +67,20 @@ class OrderItem(models.Model):
     product = models.ForeignKey("Product", on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
     price = models.DecimalField(max_digits=10, decimal_places=2)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # The product as it was when ordered; later catalog edits leave the
+    # order history alone. Products have no SKU, so the slug stands in.
+    product_name = models.CharField(max_length=255, default="")
+    product_sku = models.CharField(max_length=50, default="")
+    product_image = models.CharField(max_length=500, blank=True, null=True)
+    # Category id of the product when ordered, 0 for products without one,
+    # so that the sales rollups keep the item where it was counted
+    category_key = models.PositiveIntegerField(default=0)
+    # Set to the order's created_at, so that partitioning by month keeps
+    # an order and its items in the same month
+    created_at = models.DateTimeField(default=timezone.now)
 
     def __str__(self):
-        return f"{self.quantity}x {self.product.name}"
+        return f"{self.quantity}x {self.product_name}"
 
 
 class Cart(models.Model):
@@ -57,6 +99,14 @@ class CartItem(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            # One line per product, so that cart writes can upsert
+            models.UniqueConstraint(
+                fields=["cart", "product"], name="cart_item_unique_product"
+            ),
+        ]
+
     def __str__(self):
         return f"{self.quantity}x {self.product.name}"
 
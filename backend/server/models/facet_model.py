@@ -0,0 +1,34 @@
+from django.db import models
+
+
+class ProductFacetCount(models.Model):
+    """
+    Precomputed number of products per facet value, kept up to date by
+    Product.save and Product.delete and rebuilt by ``rebuild_facets``.
+    """
+
+    FACET_CHOICES = [
+        ("brand", "Brand"),
+        ("connection", "Connection"),
+        ("price", "Price range"),
+        # Products per exact price, which the price bounds are read from
+        ("price_point", "Price"),
+    ]
+
+    facet = models.CharField(max_length=20, choices=FACET_CHOICES)
+    value = models.CharField(max_length=255)
+    # Category id of the counted products, 0 for products without one
+    category_key = models.PositiveIntegerField(default=0)
+    is_active = models.BooleanField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["facet", "value", "category_key", "is_active"],
+                name="unique_product_facet_count",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.facet}={self.value}: {self.count}"
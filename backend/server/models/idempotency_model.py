@@ -0,0 +1,60 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+
+
+class IdempotencyKey(models.Model):
+    """
+    The response to a request sent with an ``Idempotency-Key`` header, so
+    that a retry gets the same response instead of running again. The row
+    is claimed before the request runs; ``status_code`` stays empty until
+    the response is stored, and a claim older than IDEMPOTENCY_CLAIM_LEASE
+    without one can be taken over by a retry.
+    """
+
+    user = models.ForeignKey(
+        "User", on_delete=models.CASCADE, related_name="idempotency_keys"
+    )
+    key = models.CharField(max_length=255)
+    # Method and path of the request the key was first used for
+    scope = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "scope", "key"], name="unique_idempotency_key"
+            )
+        ]
+        indexes = [
+            models.Index(fields=["expires_at"], name="idempotency_key_expiry_idx")
+        ]
+
+    def __str__(self):
+        return f"{self.scope} {self.key} ({self.status_code or 'in progress'})"
+
+
+class UsedQuote(models.Model):
+    """
+    A checkout quote token that placed an order, kept until the token
+    expires so that it cannot place another
+    """
+
+    user = models.ForeignKey(
+        "User", on_delete=models.CASCADE, related_name="used_quotes"
+    )
+    # SHA-256 of the token
+    digest = models.CharField(max_length=64, unique=True)
+    used_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [models.Index(fields=["expires_at"], name="used_quote_expiry_idx")]
+
+    def __str__(self):
+        return f"Quote {self.digest[:12]} used by {self.user_id}"
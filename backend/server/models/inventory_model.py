@@ -0,0 +1,123 @@
+from django.db import models
+
+
+class StockReservation(models.Model):
+    """
+    Stock held for an unpaid order. Held quantities are already taken off
+    Product.stock, so the available-to-sell count stays a plain column read;
+    payment commits the hold and the expiry sweep puts it back.
+    """
+
+    STATUS_CHOICES = [
+        ("held", "Held"),
+        ("committed", "Committed"),
+        ("released", "Released"),
+    ]
+
+    order = models.ForeignKey(
+        "Order", on_delete=models.CASCADE, related_name="reservations"
+    )
+    product = models.ForeignKey("Product", on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="held")
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Expiry sweep: only live holds are indexed
+            models.Index(
+                fields=["expires_at", "id"],
+                condition=models.Q(status="held"),
+                name="stock_reservation_held_idx",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.quantity}x {self.product_id} for order {self.order_id} ({self.status})"
+
+
+class ProductStockShard(models.Model):
+    """
+    One slice of the stock of a product with sharded inventory
+    (Product.stock_shards > 0). Checkouts decrement a random shard so that
+    concurrent orders of the same product lock different rows; the shards
+    are summed for the exact stock and evened out by
+    ``rebalance_stock_shards``.
+    """
+
+    product = models.ForeignKey(
+        "Product", on_delete=models.CASCADE, related_name="stock_shard_rows"
+    )
+    shard = models.PositiveSmallIntegerField()
+    stock = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "shard"], name="unique_product_stock_shard"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}#{self.shard}: {self.stock}"
+
+
+class InventoryMovement(models.Model):
+    """
+    Append-only record of every change to a product's stock. Rows are
+    never updated; ``compact_inventory_ledger`` folds them into the
+    product's InventorySnapshot.
+    """
+
+    KIND_CHOICES = [
+        ("sale", "Sale"),
+        ("restock", "Restock"),
+        ("adjustment", "Adjustment"),
+        ("release", "Reservation release"),
+    ]
+
+    product = models.ForeignKey(
+        "Product", on_delete=models.CASCADE, related_name="inventory_movements"
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    # Signed change in stock
+    quantity = models.IntegerField()
+    order = models.ForeignKey(
+        "Order",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="inventory_movements",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # History and the deltas after a snapshot, per product
+            models.Index(fields=["product", "id"], name="inventory_movement_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.quantity:+d} of {self.product_id}"
+
+
+class InventorySnapshot(models.Model):
+    """
+    A product's stock according to the ledger, as of ``movement_id``: the
+    last InventoryMovement folded in. The current ledger stock is the
+    snapshot plus the movements after it.
+    """
+
+    product = models.OneToOneField(
+        "Product",
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="inventory_snapshot",
+    )
+    stock = models.IntegerField(default=0)
+    movement_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.product_id}: {self.stock} as of movement {self.movement_id}"
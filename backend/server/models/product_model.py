@@ -1,4 +1,7 @@
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 
@@ -12,6 +15,10 @@ class Product(models.Model):
     )
     brand = models.CharField(max_length=255)
     connections = models.CharField(max_length=255)
+    # Parsed from ``connections`` on save
+    connection_types = models.ManyToManyField(
+        "ConnectionType", related_name="products", blank=True
+    )
     price = models.DecimalField(
         max_digits=10, decimal_places=2, validators=[MinValueValidator(Decimal("0.01"))]
     )
@@ -19,6 +26,9 @@ class Product(models.Model):
         max_digits=10, decimal_places=2, null=True, blank=True
     )
     stock = models.PositiveIntegerField(default=0)
+    # Opt-in for products that sell in bursts: with N > 0 the stock is split
+    # across N ProductStockShard rows and ``stock`` is a cached total
+    stock_shards = models.PositiveSmallIntegerField(default=0)
     weight = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     is_active = models.BooleanField(default=True)
     is_featured = models.BooleanField(default=False)
@@ -26,6 +36,169 @@ class Product(models.Model):
     image_url = models.CharField(max_length=500, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Weighted name/brand/connections/description document, filled in by
+    # the server_product_search_vector database trigger
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination indexes, one per listing sort (sort key, id)
+            models.Index(
+                Coalesce("sale_price", "price"), "id", name="product_eff_price_idx"
+            ),
+            models.Index(fields=["name", "id"], name="product_name_id_idx"),
+            models.Index(fields=["created_at", "id"], name="product_created_id_idx"),
+            # Listing filters
+            models.Index(fields=["brand", "id"], name="product_brand_id_idx"),
+            models.Index(fields=["category", "id"], name="product_category_id_idx"),
+            # Search
+            GinIndex(fields=["search_vector"], name="product_search_vector_idx"),
+            GinIndex(
+                fields=["name"],
+                opclasses=["gin_trgm_ops"],
+                name="product_name_trgm_idx",
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if "stock" in field_names and "stock_shards" in field_names:
+            instance._loaded_stock = (instance.stock, instance.stock_shards)
+        return instance
+
+    def _previous_facet_keys(self):
+        """
+        The facet rows the stored product counts towards, with its row locked
+        until the end of the transaction so that concurrent edits move the
+        counts one after the other
+        """
+        if self._state.adding:
+            return []
+        from ..services.facet_store_service import stored_product_facet_keys
+
+        return stored_product_facet_keys(self.pk)
+
+    def save(self, *args, **kwargs):
+        from ..services.connection_service import sync_connection_types
+        from ..services.facet_store_service import (
+            FACET_FIELDS,
+            connection_keys,
+            product_facet_keys,
+            update_facet_counts,
+        )
+        from ..services.stats_service import invalidate_admin_stats
+        from ..services.suggest_service import SUGGEST_FIELDS
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None and self._stock_unchanged():
+            # Stock is written by the inventory functions; an instance loaded
+            # before a sale must not put the old count back
+            update_fields = kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != "stock"
+            ]
+        if update_fields is not None and not set(update_fields) & {
+            field.removesuffix("_id") for field in FACET_FIELDS
+        }:
+            suggested = bool(set(update_fields) & set(SUGGEST_FIELDS))
+            if suggested and "updated_at" not in update_fields:
+                # Other processes pick up changed suggestions by updated_at
+                update_fields = kwargs["update_fields"] = [
+                    *update_fields,
+                    "updated_at",
+                ]
+            with transaction.atomic():
+                stock_before = self._stock_before_save(update_fields)
+                super().save(*args, **kwargs)
+                self._sync_stock(stock_before)
+                invalidate_admin_stats("products")
+                if suggested:
+                    transaction.on_commit(self._update_suggestions)
+            return
+
+        with transaction.atomic():
+            previous = self._previous_facet_keys()
+            stock_before = self._stock_before_save(update_fields)
+            super().save(*args, **kwargs)
+            self._sync_stock(stock_before)
+            current = product_facet_keys(self)
+            if previous != current:
+                update_facet_counts(previous, current)
+            if connection_keys(previous) != connection_keys(current):
+                sync_connection_types(self)
+            invalidate_admin_stats("products")
+            transaction.on_commit(self._update_suggestions)
+
+    def _stock_unchanged(self):
+        loaded = getattr(self, "_loaded_stock", None)
+        return (
+            not self._state.adding and loaded is not None and (loaded[0] == self.stock)
+        )
+
+    def _stock_before_save(self, update_fields):
+        """
+        The exact stock before a save that sets it by hand, locked until the
+        end of the transaction; None when the save leaves stock alone.
+        """
+        if self._state.adding:
+            return 0
+        if update_fields is not None and "stock" not in update_fields:
+            return None
+        from ..services.inventory_service import locked_stock
+
+        return locked_stock(self.pk)
+
+    def _sync_stock(self, stock_before):
+        """
+        Spread the stock over the shards when sharding or stock changed, and
+        record a stock set by hand in the inventory ledger
+        """
+        from ..services.inventory_service import (
+            rebalance_stock_shards,
+            record_stock_edit,
+        )
+
+        loaded = getattr(self, "_loaded_stock", None)
+        if (self.stock_shards or (loaded and loaded[1])) and loaded != (
+            self.stock,
+            self.stock_shards,
+        ):
+            # A stock set by hand replaces the shards, otherwise the shards
+            # hold the truth and ``stock`` is refreshed from them
+            self.stock = rebalance_stock_shards(
+                self.pk, self.stock if stock_before is not None else None
+            )
+        if stock_before is not None and self.stock != stock_before:
+            record_stock_edit(self.pk, self.stock - stock_before)
+        self._loaded_stock = (self.stock, self.stock_shards)
+
+    def _update_suggestions(self):
+        from ..services.suggest_service import suggest_index
+
+        suggest_index.product_changed(
+            self.pk,
+            self.name,
+            self.slug,
+            self.brand,
+            self.category.slug if self.category_id else None,
+            self.is_active,
+        )
+
+    def delete(self, *args, **kwargs):
+        from ..services.facet_store_service import update_facet_counts
+        from ..services.stats_service import invalidate_admin_stats
+        from ..services.suggest_service import suggest_index
+
+        with transaction.atomic():
+            previous = self._previous_facet_keys()
+            product_id = self.pk
+            result = super().delete(*args, **kwargs)
+            update_facet_counts(previous, [])
+            invalidate_admin_stats("products")
+            transaction.on_commit(lambda: suggest_index.product_deleted(product_id))
+        return result
 
     @property
     def display_image(self):
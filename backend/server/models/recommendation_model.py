@@ -0,0 +1,36 @@
+from django.db import models
+from django.utils import timezone
+
+
+class ProductNeighbor(models.Model):
+    """
+    Precomputed top-N related products per product, written in bulk by the
+    offline recommendation builders and read with one indexed lookup.
+    """
+
+    KIND_CHOICES = [
+        ("co_purchase", "Frequently bought together"),
+        ("similar", "Similar products"),
+    ]
+
+    product = models.ForeignKey(
+        "Product", on_delete=models.CASCADE, related_name="neighbors"
+    )
+    neighbor = models.ForeignKey(
+        "Product", on_delete=models.CASCADE, related_name="neighbor_of"
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+    # When the build that wrote the row started
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["kind", "product", "neighbor"], name="unique_product_neighbor"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} -> {self.neighbor_id} ({self.kind})"
@@ -0,0 +1,63 @@
+from django.db import models
+
+
+class DailySalesFields(models.Model):
+    """
+    Orders, units and revenue of the orders created on ``day`` that are in
+    ``status`` now. Kept up to date as orders are placed and change status,
+    and rebuilt by ``rebuild_sales_rollups``.
+    """
+
+    day = models.DateField()
+    status = models.CharField(max_length=20)
+    orders = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        abstract = True
+
+
+class DailySales(DailySalesFields):
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["day", "status"], name="unique_daily_sales")
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.status}: {self.orders} orders"
+
+
+class DailyCategorySales(DailySalesFields):
+    """Per category; ``orders`` counts the orders with any item of it"""
+
+    # Category id of the products sold, 0 for products without one
+    category_key = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["category_key", "day", "status"],
+                name="unique_daily_category_sales",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.day} category {self.category_key} {self.status}"
+
+
+class DailyProductSales(DailySalesFields):
+    product = models.ForeignKey(
+        "Product", on_delete=models.CASCADE, related_name="daily_sales"
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "day", "status"],
+                name="unique_daily_product_sales",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.day} product {self.product_id} {self.status}"
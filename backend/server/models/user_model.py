@@ -54,12 +54,9 @@ class User(AbstractUser):
         return self.orders.filter(status__in=["pending", "processing"]).exists()
 
     def get_cart_total(self):
-        if hasattr(self, "cart"):
-            return sum(
-                item.product.current_price * item.quantity
-                for item in self.cart.items.all()
-            )
-        return 0
+        from ..services.cart_service import cart_total
+
+        return cart_total(self)
 
 
 class Customer(User):
@@ -115,13 +112,18 @@ class AdminStaff(User):
         return Order.objects.all()
 
     def get_admin_stats(self):
-        from ..models import Order, Product
+        from ..services.stats_service import (
+            customer_stats,
+            order_stats,
+            product_stats,
+        )
 
+        products = product_stats()
         stats = {
-            "total_customers": Customer.objects.count(),
-            "total_products": Product.objects.count(),
-            "low_stock_products": Product.objects.filter(stock__lt=10).count(),
-            "pending_orders": Order.objects.filter(status="pending").count(),
+            "total_customers": customer_stats()["total_customers"],
+            "total_products": products["total_products"],
+            "low_stock_products": products["low_stock_products"],
+            "pending_orders": order_stats()["pending_orders"],
         }
         return stats
 
@@ -1,5 +1,10 @@
 from .user_serializer import LoginSerializer
-from .product_serializer import ProductSerializer
+from .product_serializer import ProductSerializer, ProductReadSerializer
 from .category_serializer import CategorySerializer
 
-__all__ = ["LoginSerializer", "ProductSerializer", "CategorySerializer"]
+__all__ = [
+    "LoginSerializer",
+    "ProductSerializer",
+    "ProductReadSerializer",
+    "CategorySerializer",
+]
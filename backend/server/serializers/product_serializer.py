@@ -1,12 +1,16 @@
+from functools import cache
 from rest_framework import serializers
+from django.db.models import QuerySet
+from django.utils import timezone
 from django.utils.text import slugify
 from server.models import Product
+from server.services.inventory_service import available_stock
 
 
 class ProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
-        fields = "__all__"
+        exclude = ("search_vector", "connection_types")
         read_only_fields = ("slug", "created_at", "updated_at")
 
     def create(self, validated_data):
@@ -44,3 +48,95 @@ class ProductSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError({"stock": "Stock cannot be negative"})
 
         return data
+
+
+def _format_decimal(value):
+    return "{:f}".format(value)
+
+
+def _format_datetime(value):
+    value = value.astimezone(timezone.get_current_timezone()).isoformat()
+    if value.endswith("+00:00"):
+        value = value[:-6] + "Z"
+    return value
+
+
+class ProductReadSerializer:
+    """
+    Read-only fast path for product listings. Renders the same JSON as
+    ProductSerializer, but reads plain rows with ``.values()`` and formats
+    them in a single loop instead of going through DRF's per-field
+    machinery. Accepts a Product queryset or rows already fetched with
+    ``ProductReadSerializer.columns()``. ``fields`` narrows the output, and
+    the columns read, to a subset of ``field_names()``.
+
+    ``stock`` is read from the ``available_stock`` annotation, the exact
+    stock of sharded products too; querysets whose rows are fetched by the
+    caller go through ``annotate()`` first.
+    """
+
+    def __init__(self, instance, many=True, fields=None):
+        self.instance = instance
+        self.many = many
+        self.fields = fields
+
+    @staticmethod
+    @cache
+    def _layout():
+        """(output name, row column, formatter) for each ProductSerializer field"""
+        layout = []
+        for name, field in ProductSerializer().fields.items():
+            column = name
+            formatter = None
+            if name == "stock":
+                column = "available_stock"
+            elif isinstance(field, serializers.PrimaryKeyRelatedField):
+                column = f"{name}_id"
+            elif isinstance(field, serializers.DecimalField):
+                formatter = _format_decimal
+            elif isinstance(field, serializers.DateTimeField):
+                formatter = _format_datetime
+            layout.append((name, column, formatter))
+        return tuple(layout)
+
+    @classmethod
+    def field_names(cls):
+        return [name for name, _column, _formatter in cls._layout()]
+
+    @classmethod
+    def _selected_layout(cls, fields):
+        if fields is None:
+            return cls._layout()
+        return tuple(entry for entry in cls._layout() if entry[0] in fields)
+
+    @classmethod
+    def columns(cls, fields=None):
+        return [column for _name, column, _formatter in cls._selected_layout(fields)]
+
+    @classmethod
+    def annotate(cls, queryset, fields=None):
+        """``queryset`` with the annotations the columns of ``fields`` need"""
+        if "available_stock" in cls.columns(fields):
+            queryset = queryset.annotate(available_stock=available_stock())
+        return queryset
+
+    @property
+    def data(self):
+        rows = self.instance
+        if isinstance(rows, QuerySet):
+            rows = self.annotate(rows, self.fields).values(*self.columns(self.fields))
+        elif not self.many:
+            rows = [rows]
+        layout = self._selected_layout(self.fields)
+        data = [
+            {
+                name: (
+                    formatter(row[column])
+                    if formatter and row[column] is not None
+                    else row[column]
+                )
+                for name, column, formatter in layout
+            }
+            for row in rows
+        ]
+        return data if self.many else data[0]
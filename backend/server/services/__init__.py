@@ -0,0 +1,30 @@
+from .catalog_service import (
+    filter_products,
+    sort_products,
+    paginate_keyset,
+    is_paginated_request,
+    parse_id_list,
+)
+from .facet_service import compute_product_facets, get_product_facets
+from .search_service import search_products
+from .suggest_service import suggest_index
+from .fieldset_service import select_fields
+from .recommendation_service import recent_purchases, recommended_products
+from .order_service import parse_order_lines, place_order
+
+__all__ = [
+    "filter_products",
+    "sort_products",
+    "paginate_keyset",
+    "is_paginated_request",
+    "parse_id_list",
+    "compute_product_facets",
+    "get_product_facets",
+    "search_products",
+    "suggest_index",
+    "select_fields",
+    "recent_purchases",
+    "recommended_products",
+    "parse_order_lines",
+    "place_order",
+]
@@ -0,0 +1,228 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from ..models import Cart, CartItem, Product
+from .inventory_service import available_stock, order_quantities
+
+MAX_CART_LINES = 100
+
+
+def parse_cart_lines(items, allow_zero=False):
+    """
+    Validate the ``items`` of a cart request into {product_id: quantity},
+    adding up repeated products. A quantity of 0 removes the line when
+    ``allow_zero`` is set.
+    """
+    if not isinstance(items, list) or not items:
+        raise ValueError("items must be a non-empty list")
+    lines = {}
+    for item in items:
+        try:
+            product_id = int(item.get("product_id"))
+            quantity = int(item.get("quantity", 1))
+        except (AttributeError, TypeError, ValueError):
+            raise ValueError("Each item needs an integer product_id and quantity")
+        if quantity < 0 or (quantity == 0 and not allow_zero):
+            raise ValueError(f"Invalid quantity for product {product_id}")
+        lines[product_id] = lines.get(product_id, 0) + quantity
+    if len(lines) > MAX_CART_LINES:
+        raise ValueError(f"At most {MAX_CART_LINES} products per cart")
+    return lines
+
+
+def _lock_cart(user):
+    """The user's cart, locked so that writes to one cart do not interleave"""
+    cart, _created = Cart.objects.get_or_create(user=user)
+    return Cart.objects.select_for_update().get(pk=cart.pk)
+
+
+def _sellable(product_ids):
+    return set(
+        Product.objects.filter(id__in=product_ids, is_active=True).values_list(
+            "id", flat=True
+        )
+    )
+
+
+def _write_lines(cart, quantities):
+    """
+    Make the cart lines of {product_id: quantity} hold those quantities in
+    one upsert, and delete the lines set to 0
+    """
+    now = timezone.now()
+    kept = {
+        product_id: quantity
+        for product_id, quantity in quantities.items()
+        if quantity > 0
+    }
+    removed = [
+        product_id for product_id, quantity in quantities.items() if not quantity
+    ]
+    if kept:
+        # created_at of existing lines is left alone on conflict
+        CartItem.objects.bulk_create(
+            [
+                CartItem(cart=cart, product_id=product_id, quantity=quantity)
+                for product_id, quantity in kept.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["cart", "product"],
+            update_fields=["quantity", "updated_at"],
+        )
+    if removed:
+        CartItem.objects.filter(cart=cart, product_id__in=removed).delete()
+    Cart.objects.filter(pk=cart.pk).update(updated_at=now)
+
+
+def _current_quantities(cart, product_ids):
+    return dict(
+        CartItem.objects.filter(cart=cart, product_id__in=product_ids).values_list(
+            "product_id", "quantity"
+        )
+    )
+
+
+def add_to_cart(user, lines):
+    """Add {product_id: quantity} on top of what the cart already holds"""
+    missing = set(lines) - _sellable(lines)
+    if missing:
+        raise ValueError(f"Product with ID {min(missing)} not found")
+    with transaction.atomic():
+        cart = _lock_cart(user)
+        current = _current_quantities(cart, lines)
+        _write_lines(
+            cart,
+            {
+                product_id: current.get(product_id, 0) + quantity
+                for product_id, quantity in lines.items()
+            },
+        )
+
+
+def update_cart(user, lines):
+    """Set the quantities of {product_id: quantity}; 0 removes the line"""
+    added = {product_id for product_id, quantity in lines.items() if quantity}
+    missing = added - _sellable(added)
+    if missing:
+        raise ValueError(f"Product with ID {min(missing)} not found")
+    with transaction.atomic():
+        _write_lines(_lock_cart(user), lines)
+
+
+def remove_from_cart(user, product_ids):
+    with transaction.atomic():
+        _write_lines(_lock_cart(user), dict.fromkeys(product_ids, 0))
+
+
+def clear_cart(user):
+    with transaction.atomic():
+        cart = _lock_cart(user)
+        _write_lines(
+            cart, dict.fromkeys(cart.items.values_list("product_id", flat=True), 0)
+        )
+
+
+def take_ordered(user, lines):
+    """
+    Take the (product_id, quantity) lines of an order placed from the cart
+    off the cart. What was added since the lines were read stays.
+    """
+    quantities = order_quantities(lines)
+    with transaction.atomic():
+        cart = _lock_cart(user)
+        current = _current_quantities(cart, quantities)
+        if current:
+            _write_lines(
+                cart,
+                {
+                    product_id: max(quantity - quantities[product_id], 0)
+                    for product_id, quantity in current.items()
+                },
+            )
+
+
+def merge_cart(user, lines):
+    """
+    Merge a cart kept by a signed out browser into the user's cart. Each
+    product ends up with the larger of the two quantities, so merging the
+    same browser cart twice changes nothing. Products that are gone or
+    no longer sold are dropped.
+    """
+    sellable = _sellable(lines)
+    with transaction.atomic():
+        cart = _lock_cart(user)
+        current = _current_quantities(cart, sellable)
+        merged = {
+            product_id: quantity
+            for product_id, quantity in lines.items()
+            if product_id in sellable and quantity > current.get(product_id, 0)
+        }
+        if merged:
+            _write_lines(cart, merged)
+
+
+def cart_lines(user):
+    """The (product_id, quantity) lines of the user's cart, for checkout"""
+    return list(
+        CartItem.objects.filter(cart__user=user)
+        .order_by("id")
+        .values_list("product_id", "quantity")
+    )
+
+
+def cart_total(user):
+    """What the cart costs at the current prices, in one aggregate query"""
+    total = CartItem.objects.filter(cart__user=user).aggregate(
+        total=Sum(F("quantity") * Coalesce("product__sale_price", "product__price"))
+    )["total"]
+    return total or Decimal("0.00")
+
+
+def cart_summary(user):
+    """
+    The cart lines with their current prices and availability, the number
+    of units and the total, read in one indexed query
+    """
+    items = (
+        CartItem.objects.filter(cart__user=user)
+        .select_related("product")
+        .only(
+            "id",
+            "quantity",
+            "product__id",
+            "product__name",
+            "product__slug",
+            "product__image_url",
+            "product__price",
+            "product__sale_price",
+            "product__is_active",
+        )
+        .annotate(stock=available_stock("product__"))
+        .order_by("id")
+    )
+    lines = []
+    total = Decimal("0.00")
+    item_count = 0
+    for item in items:
+        product = item.product
+        price = product.sale_price if product.sale_price is not None else product.price
+        subtotal = price * item.quantity
+        total += subtotal
+        item_count += item.quantity
+        lines.append(
+            {
+                "product_id": product.id,
+                "name": product.name,
+                "slug": product.slug,
+                "image": product.image_url,
+                "price": str(price),
+                "quantity": item.quantity,
+                "subtotal": str(subtotal),
+                "available": product.is_active and item.stock >= item.quantity,
+            }
+        )
+    return {"items": lines, "item_count": item_count, "total": str(total)}
@@ -0,0 +1,288 @@
+import base64
+import binascii
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.postgres.search import SearchQuery
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.functions import Coalesce
+from django.utils.dateparse import parse_datetime
+
+from ..models import Product
+
+# Price buckets shared by the listing filters and the filter sidebar.
+# Each bucket is (name, lower bound inclusive, upper bound exclusive).
+PRICE_RANGES = [
+    ("Under $100", Decimal("0"), Decimal("100")),
+    ("$100 - $300", Decimal("100"), Decimal("300")),
+    ("$300 - $500", Decimal("300"), Decimal("500")),
+    ("Over $500", Decimal("500"), None),
+]
+
+# Sort names match the options of the frontend product grid. Every ordering
+# ends on id so that it is total and can be used as a keyset.
+SORT_ORDERINGS = {
+    "default": ("id",),
+    "price-low": ("effective_price", "id"),
+    "price-high": ("-effective_price", "-id"),
+    "name": ("name", "id"),
+    "newest": ("-created_at", "-id"),
+}
+
+_CURSOR_DECODERS = {
+    "rank": float,
+    "effective_price": Decimal,
+    "name": str,
+    "created_at": parse_datetime,
+    "total_amount": Decimal,
+}
+
+SEARCH_CONFIG = "english"
+
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+MAX_BATCH_SIZE = 100
+
+
+def search_query(text):
+    """Full-text query for user input, accepting quotes, OR and -excluded"""
+    return SearchQuery(text, config=SEARCH_CONFIG, search_type="websearch")
+
+
+def effective_price():
+    """The price a customer pays: the sale price when set, else the list price"""
+    return Coalesce("sale_price", "price")
+
+
+def get_list_param(params, key):
+    """Read a multi-valued parameter given either repeated or comma separated"""
+    values = []
+    for raw in params.getlist(key):
+        values.extend(v.strip() for v in raw.split(","))
+    return [v for v in values if v]
+
+
+def parse_id_list(params, key="ids"):
+    """Read a list of ids for a batch lookup, without duplicates"""
+    try:
+        ids = list(dict.fromkeys(int(value) for value in get_list_param(params, key)))
+    except ValueError:
+        raise ValueError(f"{key} must be a comma separated list of integers")
+    if not ids:
+        raise ValueError(f"{key} is required")
+    if len(ids) > MAX_BATCH_SIZE:
+        raise ValueError(f"At most {MAX_BATCH_SIZE} {key} per request")
+    return ids
+
+
+def parse_bool(value):
+    if value is None:
+        return None
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _parse_decimal(params, key):
+    value = params.get(key)
+    if value in (None, ""):
+        return None
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f"Invalid value for {key}: {value}")
+
+
+def price_range_q(name):
+    for range_name, lower, upper in PRICE_RANGES:
+        if range_name == name:
+            q = Q(effective_price__gte=lower)
+            if upper is not None:
+                q &= Q(effective_price__lt=upper)
+            return q
+    raise ValueError(f"Unknown price range: {name}")
+
+
+def price_bucket(price):
+    """Name of the PRICE_RANGES bucket holding ``price``"""
+    for name, lower, upper in PRICE_RANGES:
+        if price >= lower and (upper is None or price < upper):
+            return name
+    return PRICE_RANGES[0][0]
+
+
+def split_connections(value):
+    """Split a Product.connections string into its individual entries"""
+    return [" ".join(c.split()) for c in (value or "").split(",") if c.strip()]
+
+
+def connection_key(name):
+    """Case and whitespace insensitive key of a connection type"""
+    return " ".join(name.lower().split())
+
+
+def connections_q(names):
+    """Products having any of the connection types ``names``"""
+    through = Product.connection_types.through
+    return Q(
+        Exists(
+            through.objects.filter(
+                product_id=OuterRef("pk"),
+                connectiontype__key__in=[connection_key(name) for name in names],
+            )
+        )
+    )
+
+
+def build_product_filters(params):
+    """
+    Translate listing query parameters into named Q objects.
+
+    Keys are the filter dimensions so that callers can drop one of them,
+    e.g. to count brands under every filter except the brand filter.
+    Filters on price expect the queryset to be annotated with
+    ``effective_price``.
+    """
+    filters = {}
+
+    category = params.get("category")
+    if category:
+        filters["category"] = Q(category__slug=category)
+
+    brands = get_list_param(params, "brand")
+    if brands:
+        filters["brand"] = Q(brand__in=brands)
+
+    connections = get_list_param(params, "connections")
+    if connections:
+        filters["connections"] = connections_q(connections)
+
+    price_q = Q()
+    for name in get_list_param(params, "price_range"):
+        price_q |= price_range_q(name)
+    price_min = _parse_decimal(params, "price_min")
+    if price_min is not None:
+        price_q &= Q(effective_price__gte=price_min)
+    price_max = _parse_decimal(params, "price_max")
+    if price_max is not None:
+        price_q &= Q(effective_price__lte=price_max)
+    if price_q:
+        filters["price"] = price_q
+
+    search = params.get("search", "").strip()
+    if search:
+        filters["search"] = Q(search_vector=search_query(search))
+
+    is_active = parse_bool(params.get("is_active"))
+    if is_active is not None:
+        filters["is_active"] = Q(is_active=is_active)
+
+    return filters
+
+
+def filter_products(queryset, params, exclude=()):
+    """Apply the listing filters in ``params`` to a Product queryset"""
+    queryset = queryset.annotate(effective_price=effective_price())
+    for name, q in build_product_filters(params).items():
+        if name not in exclude:
+            queryset = queryset.filter(q)
+    return queryset
+
+
+def get_sort(params, sorts=SORT_ORDERINGS, default="default"):
+    sort = params.get("sort") or default
+    if sort not in sorts:
+        raise ValueError(f"Unknown sort: {sort}")
+    return sort
+
+
+def sort_products(queryset, params):
+    return queryset.order_by(*SORT_ORDERINGS[get_sort(params)])
+
+
+def is_paginated_request(params):
+    return "limit" in params or "cursor" in params
+
+
+def _parse_limit(params):
+    try:
+        limit = int(params.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def encode_cursor(sort, value, last_id):
+    if isinstance(value, Decimal):
+        value = str(value)
+    elif hasattr(value, "isoformat"):
+        value = value.isoformat()
+    payload = json.dumps([sort, value, last_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, sort, key=None):
+    """
+    The sort value and last id of a cursor from encode_cursor, the value
+    decoded for the sort ``key``. Any malformed cursor raises
+    ValueError("Invalid cursor").
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, value, last_id = json.loads(base64.urlsafe_b64decode(padded))
+        if cursor_sort == sort:
+            last_id = int(last_id)
+            if key in _CURSOR_DECODERS:
+                value = _CURSOR_DECODERS[key](value)
+                if value is None:
+                    raise ValueError("Invalid cursor")
+    except (binascii.Error, ValueError, TypeError, InvalidOperation):
+        raise ValueError("Invalid cursor")
+    if cursor_sort != sort:
+        raise ValueError("Cursor does not match the requested sort")
+    return value, last_id
+
+
+def keyset_filter(queryset, ordering, cursor, sort):
+    """Restrict an ordered queryset to the rows after ``cursor``"""
+    key = ordering[0].lstrip("-")
+    value, last_id = decode_cursor(cursor, sort, key)
+    lookup = "lt" if ordering[0].startswith("-") else "gt"
+    if key == "id":
+        return queryset.filter(**{f"id__{lookup}": last_id})
+    return queryset.filter(
+        Q(**{f"{key}__{lookup}": value}) | Q(**{key: value, f"id__{lookup}": last_id})
+    )
+
+
+def paginate_keyset(
+    queryset, params, sorts=SORT_ORDERINGS, default_sort="default", fields=None
+):
+    """
+    Return one page of ``queryset`` sorted by the ``sort`` parameter and the
+    cursor for the next page (None on the last page). With ``fields`` the
+    page holds ``.values()`` dicts of those fields instead of instances.
+
+    Pages are keyset based on (sort key, id), so every page is a bounded
+    index range scan no matter how deep the client pages.
+    """
+    sort = get_sort(params, sorts, default_sort)
+    ordering = sorts[sort]
+    key = ordering[0].lstrip("-")
+    limit = _parse_limit(params)
+
+    queryset = queryset.order_by(*ordering)
+    cursor = params.get("cursor")
+    if cursor:
+        queryset = keyset_filter(queryset, ordering, cursor, sort)
+    if fields is not None:
+        queryset = queryset.values(*dict.fromkeys([*fields, "id", key]))
+
+    page = list(queryset[: limit + 1])
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        last = page[-1]
+        if fields is not None:
+            next_cursor = encode_cursor(sort, last[key], last["id"])
+        else:
+            next_cursor = encode_cursor(sort, getattr(last, key), last.id)
+    return page, next_cursor
@@ -0,0 +1,15 @@
+from ..models import ConnectionType
+from .catalog_service import connection_key, split_connections
+
+
+def sync_connection_types(product):
+    """Point product.connection_types at the entries of product.connections"""
+    names = {}
+    for name in split_connections(product.connections):
+        names.setdefault(connection_key(name), name)
+
+    ConnectionType.objects.bulk_create(
+        [ConnectionType(key=key, name=name) for key, name in names.items()],
+        ignore_conflicts=True,
+    )
+    product.connection_types.set(ConnectionType.objects.filter(key__in=names))
@@ -0,0 +1,207 @@
+from decimal import Decimal
+
+from django.db.models import Count, Max, Min, Q, Sum
+
+from ..models import Category, ConnectionType, Product, ProductFacetCount
+
+from .catalog_service import (
+    PRICE_RANGES,
+    build_product_filters,
+    effective_price,
+    get_list_param,
+    parse_bool,
+    price_range_q,
+    connection_key,
+)
+
+# Dimensions that get their own counts. Every other listing filter
+# (category, search, is_active) narrows all facets alike.
+FACET_DIMENSIONS = ("brand", "connections", "price")
+
+# Filters the precomputed ProductFacetCount rows are keyed by
+STORED_DIMENSIONS = ("category", "is_active")
+
+
+def _all_except(filters, dimension):
+    q = Q()
+    for name, condition in filters.items():
+        if name != dimension:
+            q &= condition
+    return q or None
+
+
+def price_range_options(price_min, price_max, counts):
+    """Build the price_ranges payload, skipping buckets outside the data"""
+    if price_min is None:
+        return [
+            {
+                "name": name,
+                "min": int(lower),
+                "max": float(upper - Decimal("0.01")) if upper else None,
+                "count": 0,
+            }
+            for name, lower, upper in PRICE_RANGES
+        ]
+
+    options = []
+    for name, lower, upper in PRICE_RANGES:
+        if price_max < lower or (upper is not None and price_min >= upper):
+            continue
+        options.append(
+            {
+                "name": name,
+                "min": int(lower),
+                "max": float(upper - Decimal("0.01")) if upper else None,
+                "count": counts.get(name, 0),
+            }
+        )
+    return options
+
+
+def compute_product_facets(queryset, params):
+    """
+    Count brands, connection types and price buckets for the filter sidebar.
+
+    Facets drill down: each dimension is counted under every active filter
+    except its own, so selecting a brand keeps the other brands visible with
+    the counts they would add. Brands and prices come from a single GROUP BY
+    brand with one conditional aggregate per dimension; connection types are
+    counted with a second GROUP BY over the product/connection type join.
+    """
+    filters = build_product_filters(params)
+    shared = Q()
+    for name, condition in filters.items():
+        if name not in FACET_DIMENSIONS:
+            shared &= condition
+
+    aggregates = {
+        "brand_count": Count("id", filter=_all_except(filters, "brand")),
+        "price_min": Min("effective_price", filter=_all_except(filters, "price")),
+        "price_max": Max("effective_price", filter=_all_except(filters, "price")),
+    }
+    price_filter = _all_except(filters, "price") or Q()
+    for index, (name, _lower, _upper) in enumerate(PRICE_RANGES):
+        aggregates[f"price_{index}"] = Count(
+            "id", filter=price_filter & price_range_q(name)
+        )
+
+    products = queryset.annotate(effective_price=effective_price()).filter(shared)
+    groups = products.values("brand").annotate(**aggregates).order_by()
+
+    brands = {}
+    price_counts = {}
+    price_min = price_max = None
+    for group in groups:
+        brands[group["brand"]] = group["brand_count"]
+        for index, (name, _lower, _upper) in enumerate(PRICE_RANGES):
+            price_counts[name] = price_counts.get(name, 0) + group[f"price_{index}"]
+        if group["price_min"] is not None:
+            if price_min is None or group["price_min"] < price_min:
+                price_min = group["price_min"]
+            if price_max is None or group["price_max"] > price_max:
+                price_max = group["price_max"]
+
+    connection_products = products.filter(_all_except(filters, "connections") or Q())
+    connection_counts = (
+        Product.connection_types.through.objects.filter(
+            product__in=connection_products.values("id")
+        )
+        .values("connectiontype__name")
+        .annotate(count=Count("product_id"))
+        .order_by()
+    )
+    connections = {
+        row["connectiontype__name"]: row["count"] for row in connection_counts
+    }
+
+    return facet_payload(
+        params, brands, connections, price_counts, price_min, price_max
+    )
+
+
+def facet_payload(params, brands, connections, price_counts, price_min, price_max):
+    """Shape facet counts into the get_product_filters response"""
+    # Keep selected values listed even when the other filters empty them,
+    # so the sidebar can still untick them.
+    selected_brands = set(get_list_param(params, "brand"))
+    selected_connections = {
+        connection_key(name) for name in get_list_param(params, "connections")
+    }
+
+    return {
+        "brands": [
+            {"brand": brand, "count": count}
+            for brand, count in sorted(brands.items())
+            if count or brand in selected_brands
+        ],
+        "connections": [
+            {"connections": connection, "count": count}
+            for connection, count in sorted(connections.items())
+            if count or connection_key(connection) in selected_connections
+        ],
+        "types": [],
+        "price_ranges": price_range_options(price_min, price_max, price_counts),
+        "price_min": price_min,
+        "price_max": price_max,
+    }
+
+
+def read_stored_facets(params):
+    """
+    Facets for the unfiltered sidebar (optionally narrowed to a category and
+    is_active) read from the precomputed ProductFacetCount rows, plus a
+    lookup of the connection type names. The price bounds are the lowest
+    and highest stored price points.
+    """
+    rows = ProductFacetCount.objects.filter(count__gt=0)
+    category = params.get("category")
+    if category:
+        rows = rows.filter(
+            category_key__in=Category.objects.filter(slug=category).values("id")
+        )
+    is_active = parse_bool(params.get("is_active"))
+    if is_active is not None:
+        rows = rows.filter(is_active=is_active)
+
+    counts = {"brand": {}, "connection": {}, "price": {}}
+    totals = (
+        rows.exclude(facet="price_point")
+        .values("facet", "value")
+        .annotate(total=Sum("count"))
+        .order_by()
+    )
+    for row in totals:
+        counts[row["facet"]][row["value"]] = row["total"]
+
+    # Connection rows are stored by key; show the connection type names
+    connection_names = dict(
+        ConnectionType.objects.filter(key__in=counts["connection"]).values_list(
+            "key", "name"
+        )
+    )
+    connections = {
+        connection_names.get(key, key): count
+        for key, count in counts["connection"].items()
+    }
+
+    bounds = rows.filter(facet="price_point").aggregate(
+        price_min=Min("value"), price_max=Max("value")
+    )
+    price_min, price_max = (
+        None if bound is None else Decimal(bound)
+        for bound in (bounds["price_min"], bounds["price_max"])
+    )
+    return facet_payload(
+        params, counts["brand"], connections, counts["price"], price_min, price_max
+    )
+
+
+def get_product_facets(params):
+    """
+    Serve the sidebar from the facet store when only stored dimensions are
+    filtered, and fall back to the live drill-down query otherwise.
+    """
+    filters = build_product_filters(params)
+    if set(filters) <= set(STORED_DIMENSIONS):
+        return read_stored_facets(params)
+    return compute_product_facets(Product.objects.all(), params)
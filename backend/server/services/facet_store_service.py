@@ -0,0 +1,153 @@
+from collections import Counter
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+
+from ..models import Product, ProductFacetCount
+from .catalog_service import connection_key, price_bucket, split_connections
+
+# Product fields that decide which facet rows a product is counted in
+FACET_FIELDS = (
+    "brand",
+    "connections",
+    "price",
+    "sale_price",
+    "category_id",
+    "is_active",
+)
+
+
+def price_point(price):
+    """
+    Zero-padded text of a price, so that the text order of price_point
+    values is the price order
+    """
+    return f"{price:011.2f}"
+
+
+def facet_keys(brand, connections, price, sale_price, category_id, is_active):
+    """
+    The (facet, value, category_key, is_active) rows a product counts
+    towards: its brand, each of its connection type keys, its price bucket
+    and its price point.
+    """
+    category_key = category_id or 0
+    is_active = bool(is_active)
+    keys = [("brand", brand, category_key, is_active)]
+    for key in sorted(
+        {connection_key(name) for name in split_connections(connections)}
+    ):
+        keys.append(("connection", key, category_key, is_active))
+    effective = sale_price if sale_price is not None else price
+    if effective is not None:
+        keys.append(("price", price_bucket(effective), category_key, is_active))
+        keys.append(("price_point", price_point(effective), category_key, is_active))
+    return keys
+
+
+def connection_keys(keys):
+    return {key[1] for key in keys if key[0] == "connection"}
+
+
+def product_facet_keys(product):
+    return facet_keys(*(getattr(product, field) for field in FACET_FIELDS))
+
+
+def stored_product_facet_keys(product_id):
+    """The stored product's facet keys, locked until the end of the transaction"""
+    values = (
+        Product.objects.select_for_update(no_key=True)
+        .filter(pk=product_id)
+        .values_list(*FACET_FIELDS)
+        .first()
+    )
+    return facet_keys(*values) if values else []
+
+
+def update_facet_counts(removed, added):
+    """Move one product's contribution from the ``removed`` to ``added`` keys"""
+    delta = Counter(added)
+    delta.subtract(Counter(removed))
+    # Sorted so that concurrent writers lock the rows in the same order
+    changes = sorted((key, change) for key, change in delta.items() if change)
+    if not changes:
+        return
+
+    with transaction.atomic():
+        for (facet, value, category_key, is_active), change in changes:
+            rows = ProductFacetCount.objects.filter(
+                facet=facet,
+                value=value,
+                category_key=category_key,
+                is_active=is_active,
+            )
+            if rows.update(count=F("count") + change) or change < 0:
+                continue
+            try:
+                with transaction.atomic():
+                    ProductFacetCount.objects.create(
+                        facet=facet,
+                        value=value,
+                        category_key=category_key,
+                        is_active=is_active,
+                        count=change,
+                    )
+            except IntegrityError:
+                # A concurrent writer created the row first
+                rows.update(count=F("count") + change)
+
+
+def expected_facet_counts():
+    """Count facet keys straight from the Product table"""
+    counts = Counter()
+    rows = Product.objects.values_list(*FACET_FIELDS).order_by()
+    for values in rows.iterator(chunk_size=2000):
+        counts.update(facet_keys(*values))
+    return counts
+
+
+def stored_facet_counts():
+    counts = Counter()
+    rows = ProductFacetCount.objects.filter(count__gt=0).values_list(
+        "facet", "value", "category_key", "is_active", "count"
+    )
+    for facet, value, category_key, is_active, count in rows:
+        counts[(facet, value, category_key, is_active)] += count
+    return counts
+
+
+def facet_count_drift(expected, stored):
+    """Keys whose stored count differs, as {key: (expected, stored)}"""
+    return {
+        key: (expected.get(key, 0), stored.get(key, 0))
+        for key in set(expected) | set(stored)
+        if expected.get(key, 0) != stored.get(key, 0)
+    }
+
+
+def rebuild_facet_counts():
+    """Replace the stored facet counts with a fresh count of the catalog"""
+    with transaction.atomic():
+        if connection.vendor == "postgresql":
+            # Hold off incremental updates until the new counts are in place.
+            # Writers waiting on the lock apply their delta on top afterwards.
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"LOCK TABLE {ProductFacetCount._meta.db_table} IN EXCLUSIVE MODE"
+                )
+        expected = expected_facet_counts()
+        ProductFacetCount.objects.all().delete()
+        ProductFacetCount.objects.bulk_create(
+            [
+                ProductFacetCount(
+                    facet=facet,
+                    value=value,
+                    category_key=category_key,
+                    is_active=is_active,
+                    count=count,
+                )
+                for (facet, value, category_key, is_active), count in expected.items()
+            ],
+            batch_size=1000,
+        )
+    return expected
@@ -0,0 +1,19 @@
+from .catalog_service import get_list_param
+
+
+def select_fields(params, available):
+    """
+    The ``available`` field names picked by the ``fields`` and ``exclude``
+    query parameters, in their usual order. Without either parameter every
+    field is returned.
+    """
+    requested = get_list_param(params, "fields")
+    excluded = get_list_param(params, "exclude")
+    unknown = [name for name in requested + excluded if name not in available]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return [
+        name
+        for name in available
+        if (not requested or name in requested) and name not in excluded
+    ]
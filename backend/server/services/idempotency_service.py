@@ -0,0 +1,175 @@
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from ..models import IdempotencyKey, UsedQuote
+
+HEADER = "Idempotency-Key"
+PURGE_BATCH_SIZE = 1000
+
+
+def request_hash(request):
+    body = json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def _claim(user, scope, key, fingerprint):
+    """
+    Claim ``key`` for this request. Returns (row, True) when claimed, or
+    (row, False) with the row of the request that already holds it. The
+    unique constraint decides between concurrent duplicates.
+
+    A claim without a response that is older than IDEMPOTENCY_CLAIM_LEASE
+    belongs to a request that died or timed out. Its work commits together
+    with its response, so none of it is in the database, and a retry with
+    the same body takes the claim over.
+    """
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    for _attempt in range(3):
+        try:
+            with transaction.atomic():
+                row = IdempotencyKey.objects.create(
+                    user=user,
+                    scope=scope,
+                    key=key,
+                    request_hash=fingerprint,
+                    claimed_at=now,
+                    expires_at=expires_at,
+                )
+            return row, True
+        except IntegrityError:
+            existing = IdempotencyKey.objects.filter(
+                user=user, scope=scope, key=key
+            ).first()
+            if existing is None:
+                continue
+            if existing.expires_at <= now:
+                # Expired but not purged yet: the key is free again
+                existing.delete()
+                continue
+            lease_ended = existing.claimed_at <= now - timedelta(
+                seconds=settings.IDEMPOTENCY_CLAIM_LEASE
+            )
+            if (
+                existing.status_code is None
+                and lease_ended
+                and existing.request_hash == fingerprint
+            ):
+                # Only one retry wins the stale claim
+                taken = IdempotencyKey.objects.filter(
+                    pk=existing.pk,
+                    status_code__isnull=True,
+                    claimed_at=existing.claimed_at,
+                ).update(claimed_at=now, expires_at=expires_at)
+                if taken:
+                    existing.claimed_at = now
+                    return existing, True
+                continue
+            return existing, False
+    raise IntegrityError(f"Could not claim {HEADER} {key}")
+
+
+def _error(message, code):
+    return Response({"status": "error", "message": message}, status=code)
+
+
+def idempotent(view):
+    """
+    Let clients retry ``view`` safely with an ``Idempotency-Key`` header.
+
+    The first request with a key runs and its response is stored; later
+    requests with the same key get that response back without running the
+    view. A duplicate arriving while the first is still running gets 409,
+    and reusing a key for a different body gets 422. Requests without the
+    header run as usual.
+
+    The view runs in one transaction with the write of its response, so a
+    request that dies halfway leaves neither behind and its claim can be
+    taken over once its lease ends. Server errors are rolled back and not
+    stored, so those can be retried.
+    """
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view(request, *args, **kwargs)
+        if len(key) > 255:
+            return _error(f"{HEADER} is too long", status.HTTP_400_BAD_REQUEST)
+
+        scope = f"{request.method} {request.path}"
+        fingerprint = request_hash(request)
+        row, claimed = _claim(request.user, scope, key, fingerprint)
+        if not claimed:
+            if row.request_hash != fingerprint:
+                return _error(
+                    f"{HEADER} was already used for a different request",
+                    status.HTTP_422_UNPROCESSABLE_ENTITY,
+                )
+            if row.status_code is None:
+                return _error(
+                    f"A request with this {HEADER} is still in progress",
+                    status.HTTP_409_CONFLICT,
+                )
+            response = Response(row.response, status=row.status_code)
+            response["Idempotent-Replayed"] = "true"
+            return response
+
+        # Matches the claim only while no retry has taken it over
+        claim = IdempotencyKey.objects.filter(
+            pk=row.pk, status_code__isnull=True, claimed_at=row.claimed_at
+        )
+        try:
+            with transaction.atomic():
+                response = view(request, *args, **kwargs)
+                if response.status_code >= 500:
+                    transaction.set_rollback(True)
+                elif not claim.update(
+                    status_code=response.status_code, response=response.data
+                ):
+                    # Outlived the lease and a retry took over
+                    transaction.set_rollback(True)
+                    response = _error(
+                        f"A request with this {HEADER} is still in progress",
+                        status.HTTP_409_CONFLICT,
+                    )
+        except Exception:
+            claim.delete()
+            raise
+        if response.status_code >= 500:
+            claim.delete()
+        return response
+
+    return wrapper
+
+
+def _purge(model, batch_size, now):
+    deleted = 0
+    while True:
+        ids = list(
+            model.objects.filter(expires_at__lt=now).values_list("id", flat=True)[
+                :batch_size
+            ]
+        )
+        if not ids:
+            return deleted
+        deleted += model.objects.filter(id__in=ids).delete()[0]
+
+
+def purge_idempotency_keys(batch_size=PURGE_BATCH_SIZE, now=None):
+    """Delete expired keys in batches; returns the number deleted"""
+    return _purge(IdempotencyKey, batch_size, now or timezone.now())
+
+
+def purge_used_quotes(batch_size=PURGE_BATCH_SIZE, now=None):
+    """Delete the used quotes whose token has expired; returns the number"""
+    return _purge(UsedQuote, batch_size, now or timezone.now())
@@ -0,0 +1,491 @@
+import random
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Max, OuterRef, Subquery, Sum, When
+from django.db.models.functions import Coalesce, Mod
+from django.utils import timezone
+
+from ..models import (
+    InventoryMovement,
+    InventorySnapshot,
+    Product,
+    ProductStockShard,
+    StockReservation,
+)
+from .stats_service import invalidate_admin_stats
+
+SWEEP_BATCH_SIZE = 500
+COMPACTION_BATCH_SIZE = 1000
+# Movements younger than this are left for the next compaction, so that a
+# transaction committing after a later id was read is not skipped
+COMPACTION_LAG = timedelta(minutes=1)
+
+
+def order_quantities(lines):
+    """Total quantity per product of (product_id, quantity) lines"""
+    quantities = Counter()
+    for product_id, quantity in lines:
+        quantities[product_id] += quantity
+    return quantities
+
+
+def _stock_delta(quantities, sign):
+    return Case(
+        *(When(id=product_id, then=sign * q) for product_id, q in quantities.items()),
+        default=0,
+    )
+
+
+def take_stock(quantities):
+    """
+    Take {product_id: quantity} off the products' stock in one locking read
+    and one UPDATE, plus one UPDATE per product with sharded stock.
+
+    Rows are locked in id order, so concurrent checkouts wait on each other
+    instead of deadlocking, and the stock checked is the stock decremented.
+    Must run inside a transaction. Raises ValueError when a product is
+    missing or short; returns {product_id: product row} otherwise.
+    """
+    columns = (
+        "id",
+        "name",
+        "slug",
+        "image_url",
+        "category_id",
+        "price",
+        "sale_price",
+        "stock",
+        "stock_shards",
+        "is_active",
+    )
+    products = {
+        row["id"]: row
+        for row in Product.objects.select_for_update(no_key=True)
+        .filter(id__in=quantities, stock_shards=0)
+        .order_by("id")
+        .values(*columns)
+    }
+    plain = {product_id: quantities[product_id] for product_id in products}
+    # Sharded products are read without locking their row
+    missing = [product_id for product_id in quantities if product_id not in products]
+    if missing:
+        products.update(
+            (row["id"], row)
+            for row in Product.objects.filter(id__in=missing).values(*columns)
+        )
+
+    for product_id, quantity in quantities.items():
+        product = products.get(product_id)
+        if product is None:
+            raise ValueError(f"Product with ID {product_id} not found")
+        if product_id in plain and product["stock"] < quantity:
+            raise ValueError(
+                f"Not enough stock for {product['name']}. Available: {product['stock']}"
+            )
+
+    if plain:
+        Product.objects.filter(id__in=plain).update(
+            stock=F("stock") + _stock_delta(plain, -1)
+        )
+    for product_id in sorted(set(quantities) - set(plain)):
+        product = products[product_id]
+        _take_from_shards(product, quantities[product_id])
+    invalidate_admin_stats("products")
+    return products
+
+
+def _take_from_shards(product, quantity):
+    """
+    Take ``quantity`` from one shard, starting at a random one and moving
+    on past shards that are locked or too low. Falls back to locking every
+    shard and taking from several when no single shard can serve it.
+    """
+    shards = product["stock_shards"]
+    start = random.randrange(shards)
+    candidate = (
+        ProductStockShard.objects.select_for_update(skip_locked=True)
+        .filter(product_id=product["id"], stock__gte=quantity)
+        .annotate(turn=Mod(F("shard") + (shards - start), shards))
+        .order_by("turn")
+        .values("id")[:1]
+    )
+    if ProductStockShard.objects.filter(id__in=candidate).update(
+        stock=F("stock") - quantity
+    ):
+        return
+
+    rows = list(
+        ProductStockShard.objects.select_for_update()
+        .filter(product_id=product["id"])
+        .order_by("shard")
+        .values_list("id", "stock")
+    )
+    available = sum(stock for _id, stock in rows)
+    if available < quantity:
+        raise ValueError(
+            f"Not enough stock for {product['name']}. Available: {available}"
+        )
+    taken = {}
+    for shard_id, stock in rows:
+        if quantity <= 0:
+            break
+        taken[shard_id] = min(stock, quantity)
+        quantity -= taken[shard_id]
+    ProductStockShard.objects.filter(id__in=taken).update(
+        stock=F("stock") + _stock_delta(taken, -1)
+    )
+
+
+def return_stock(quantities):
+    """Put {product_id: quantity} back on the shelf, locking in id order"""
+    shards = dict(
+        Product.objects.select_for_update(no_key=True)
+        .filter(id__in=quantities)
+        .order_by("id")
+        .values_list("id", "stock_shards")
+    )
+    plain = {
+        product_id: quantities[product_id]
+        for product_id, count in shards.items()
+        if not count
+    }
+    Product.objects.filter(id__in=plain).update(
+        stock=F("stock") + _stock_delta(plain, 1)
+    )
+    for product_id, count in shards.items():
+        if count:
+            ProductStockShard.objects.filter(
+                product_id=product_id, shard=random.randrange(count)
+            ).update(stock=F("stock") + quantities[product_id])
+    invalidate_admin_stats("products")
+
+
+def available_stock(path=""):
+    """
+    Exact stock of each product as a queryset expression: the sum of the
+    shards for sharded products, the stock column otherwise. ``path``
+    reaches the product from another model, e.g. "product__".
+    """
+    shard_total = (
+        ProductStockShard.objects.filter(product_id=OuterRef(f"{path}pk"))
+        .values("product_id")
+        .annotate(total=Sum("stock"))
+        .values("total")
+    )
+    return Case(
+        When(
+            **{f"{path}stock_shards__gt": 0},
+            then=Coalesce(Subquery(shard_total), 0),
+        ),
+        default=F(f"{path}stock"),
+    )
+
+
+def rebalance_stock_shards(product_id, total=None):
+    """
+    Spread a product's stock evenly over its ``stock_shards`` shards, or
+    fold the shards back into Product.stock when sharding was turned off.
+    ``total`` replaces the stock, otherwise the current total is kept.
+    Refreshes the cached Product.stock and returns the total.
+    """
+    with transaction.atomic():
+        # Not FOR UPDATE: checkouts holding shard locks insert rows that
+        # reference the product, which needs a KEY SHARE lock on it
+        stock, count = (
+            Product.objects.select_for_update(no_key=True)
+            .values_list("stock", "stock_shards")
+            .get(id=product_id)
+        )
+        rows = dict(
+            ProductStockShard.objects.select_for_update()
+            .filter(product_id=product_id)
+            .order_by("shard")
+            .values_list("shard", "stock")
+        )
+        if total is None:
+            total = sum(rows.values()) if rows else stock
+
+        ProductStockShard.objects.filter(
+            product_id=product_id, shard__gte=count
+        ).delete()
+        if count:
+            share, remainder = divmod(total, count)
+            ProductStockShard.objects.bulk_create(
+                [
+                    ProductStockShard(
+                        product_id=product_id,
+                        shard=shard,
+                        stock=share + (shard < remainder),
+                    )
+                    for shard in range(count)
+                ],
+                update_conflicts=True,
+                unique_fields=["product", "shard"],
+                update_fields=["stock"],
+            )
+        Product.objects.filter(id=product_id).update(stock=total)
+        invalidate_admin_stats("products")
+    return total
+
+
+def locked_stock(product_id):
+    """
+    Exact stock of a product with its row and shards locked until the end
+    of the transaction
+    """
+    stock = (
+        Product.objects.select_for_update(no_key=True)
+        .values_list("stock", flat=True)
+        .get(id=product_id)
+    )
+    shards = list(
+        ProductStockShard.objects.select_for_update()
+        .filter(product_id=product_id)
+        .order_by("shard")
+        .values_list("stock", flat=True)
+    )
+    return sum(shards) if shards else stock
+
+
+def record_movements(kind, quantities, order=None, sign=1):
+    """Append {product_id: quantity} changes of one kind to the ledger"""
+    InventoryMovement.objects.bulk_create(
+        [
+            InventoryMovement(
+                product_id=product_id,
+                kind=kind,
+                quantity=sign * quantity,
+                order=order,
+            )
+            for product_id, quantity in quantities.items()
+        ]
+    )
+
+
+def record_stock_edit(product_id, delta):
+    """Record stock set by hand: a restock when it went up"""
+    record_movements("restock" if delta > 0 else "adjustment", {product_id: delta})
+
+
+def _folded_upto(product_id):
+    """Id of the last movement in the product's snapshot, 0 without one"""
+    return Coalesce(
+        Subquery(
+            InventorySnapshot.objects.filter(product_id=product_id).values(
+                "movement_id"
+            )
+        ),
+        0,
+    )
+
+
+def ledger_stock():
+    """
+    Stock of each product according to the inventory ledger, as a queryset
+    expression: the snapshot plus the movements recorded after it.
+    """
+    snapshot = InventorySnapshot.objects.filter(product_id=OuterRef("pk"))
+    recent = (
+        InventoryMovement.objects.filter(
+            product_id=OuterRef("pk"),
+            id__gt=_folded_upto(OuterRef(OuterRef("pk"))),
+        )
+        .values("product_id")
+        .annotate(total=Sum("quantity"))
+        .values("total")
+    )
+    return Coalesce(Subquery(snapshot.values("stock")), 0) + Coalesce(
+        Subquery(recent), 0
+    )
+
+
+def compact_inventory_ledger(batch_size=COMPACTION_BATCH_SIZE, now=None):
+    """
+    Fold ledger movements into the products' snapshots, one batch of
+    products per transaction. Movements are kept for the history. Returns
+    the number of snapshots updated.
+    """
+    cutoff = (now or timezone.now()) - COMPACTION_LAG
+    upto = InventoryMovement.objects.filter(created_at__lt=cutoff).aggregate(
+        upto=Max("id")
+    )["upto"]
+    if upto is None:
+        return 0
+
+    def unfolded(movements):
+        return movements.filter(
+            id__lte=upto, id__gt=_folded_upto(OuterRef("product_id"))
+        )
+
+    pending = list(
+        unfolded(InventoryMovement.objects.all())
+        .values_list("product_id", flat=True)
+        .distinct()
+        .order_by("product_id")
+    )
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start : start + batch_size]
+        with transaction.atomic():
+            stock = dict(
+                InventorySnapshot.objects.select_for_update()
+                .filter(product_id__in=batch)
+                .order_by("product_id")
+                .values_list("product_id", "stock")
+            )
+            deltas = (
+                unfolded(InventoryMovement.objects.filter(product_id__in=batch))
+                .values("product_id")
+                .annotate(delta=Sum("quantity"))
+                .order_by()
+            )
+            InventorySnapshot.objects.bulk_create(
+                [
+                    InventorySnapshot(
+                        product_id=row["product_id"],
+                        stock=stock.get(row["product_id"], 0) + row["delta"],
+                        movement_id=upto,
+                    )
+                    for row in deltas
+                ],
+                update_conflicts=True,
+                unique_fields=["product"],
+                update_fields=["stock", "movement_id", "updated_at"],
+            )
+    return len(pending)
+
+
+def hold_stock(order, quantities):
+    """Record the stock taken for an unpaid order so it expires if unpaid"""
+    expires_at = timezone.now() + timedelta(seconds=settings.STOCK_RESERVATION_TTL)
+    StockReservation.objects.bulk_create(
+        [
+            StockReservation(
+                order=order,
+                product_id=product_id,
+                quantity=quantity,
+                expires_at=expires_at,
+            )
+            for product_id, quantity in quantities.items()
+        ]
+    )
+
+
+def commit_reservations(order):
+    """
+    Turn the order's holds into sales on payment. Holds the sweep already
+    released take their stock again, failing with ValueError when it has
+    been sold in the meantime.
+    """
+    commit_order_reservations([order.id])
+
+
+def commit_order_reservations(order_ids):
+    """commit_reservations for many orders, in one locking read and one UPDATE"""
+    with transaction.atomic():
+        reservations = list(
+            StockReservation.objects.select_for_update()
+            .filter(order_id__in=order_ids)
+            .exclude(status="committed")
+            .order_by("id")
+            .values_list("id", "product_id", "quantity", "order_id", "status")
+        )
+        released = Counter()
+        for _id, product_id, quantity, order_id, status in reservations:
+            if status == "released":
+                released[order_id, product_id] += quantity
+        if released:
+            take_stock(
+                order_quantities(
+                    (product_id, quantity)
+                    for (_order_id, product_id), quantity in released.items()
+                )
+            )
+            InventoryMovement.objects.bulk_create(
+                [
+                    InventoryMovement(
+                        product_id=product_id,
+                        kind="sale",
+                        quantity=-quantity,
+                        order_id=order_id,
+                    )
+                    for (order_id, product_id), quantity in released.items()
+                ]
+            )
+        StockReservation.objects.filter(
+            id__in=[reservation[0] for reservation in reservations]
+        ).update(status="committed")
+
+
+def _release(reservations, restocked=()):
+    """
+    Return the stock of (id, product_id, quantity, order_id) holds. Those
+    whose id is in ``restocked`` had been paid for and are recorded as
+    restocks.
+    """
+    return_stock(
+        order_quantities((product_id, q) for _id, product_id, q, _o in reservations)
+    )
+    InventoryMovement.objects.bulk_create(
+        [
+            InventoryMovement(
+                product_id=product_id,
+                kind="restock" if reservation_id in restocked else "release",
+                quantity=quantity,
+                order_id=order_id,
+            )
+            for reservation_id, product_id, quantity, order_id in reservations
+        ]
+    )
+    StockReservation.objects.filter(
+        id__in=[reservation[0] for reservation in reservations]
+    ).update(status="released")
+
+
+def release_order_reservations(order_ids):
+    """
+    Return the stock of cancelled orders: holds of unpaid orders are
+    released, and the stock of paid ones is put back as a restock
+    """
+    with transaction.atomic():
+        reservations = list(
+            StockReservation.objects.select_for_update()
+            .filter(order_id__in=order_ids, status__in=("held", "committed"))
+            .order_by("id")
+            .values_list("id", "product_id", "quantity", "order_id", "status")
+        )
+        if reservations:
+            _release(
+                [row[:4] for row in reservations],
+                {row[0] for row in reservations if row[4] == "committed"},
+            )
+
+
+def release_expired_reservations(batch_size=SWEEP_BATCH_SIZE, now=None):
+    """
+    Return the stock of expired holds of pending, unpaid orders, one batch
+    per transaction so that checkouts are never blocked behind a long
+    sweep. Holds whose order is locked by a payment or status change in
+    progress are skipped. Returns the number released.
+    """
+    now = now or timezone.now()
+    released = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                StockReservation.objects.select_for_update(skip_locked=True)
+                .filter(
+                    status="held",
+                    expires_at__lt=now,
+                    order__status="pending",
+                    order__payment_status=False,
+                )
+                .order_by("expires_at", "id")
+                .values_list("id", "product_id", "quantity", "order_id")[:batch_size]
+            )
+            if not batch:
+                return released
+            _release(batch)
+        released += len(batch)
@@ -0,0 +1,456 @@
+import hashlib
+import json
+import uuid
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core import signing
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from ..models import Order, OrderItem, Product, UsedQuote
+from .catalog_service import effective_price, get_list_param, parse_bool
+from .inventory_service import (
+    available_stock,
+    commit_order_reservations,
+    hold_stock,
+    order_quantities,
+    record_movements,
+    release_order_reservations,
+    take_stock,
+)
+from .sales_rollup_service import move_order_sales, record_order_sales
+from .stats_service import invalidate_admin_stats
+
+# Order history is keyset paginated newest first, on (created_at, id)
+ORDER_SORTS = {"newest": ("-created_at", "-id")}
+
+# Sorts of the staff order console, each ending on id to be a keyset
+ADMIN_ORDER_SORTS = {
+    "newest": ("-created_at", "-id"),
+    "oldest": ("created_at", "id"),
+    "total-high": ("-total_amount", "-id"),
+    "total-low": ("total_amount", "id"),
+}
+
+# Above this many rows by the planner's estimate, result sets are not
+# counted exactly
+EXACT_COUNT_LIMIT = 10000
+
+MAX_BULK_ORDERS = 1000
+
+# Random hex digits of an order number. Unique across archived orders too
+# (see migration 0017), so collisions fail the checkout and have to stay
+# rare.
+ORDER_NUMBER_LENGTH = 12
+
+QUOTE_SALT = "server.order_quote"
+
+# Items named in Order.summary before the rest are only counted
+SUMMARY_ITEMS = 3
+SUMMARY_LENGTH = 255
+
+
+def order_summary(lines):
+    """
+    One line description of an order from its (product name, quantity)
+    lines, e.g. "2x Sony WH-1000XM4, 1x MX Keys and 3 more"
+    """
+    named = [f"{quantity}x {name}" for name, quantity in lines[:SUMMARY_ITEMS]]
+    summary = ", ".join(named)
+    if len(lines) > SUMMARY_ITEMS:
+        summary += f" and {len(lines) - SUMMARY_ITEMS} more"
+    if len(summary) > SUMMARY_LENGTH:
+        summary = summary[: SUMMARY_LENGTH - 3] + "..."
+    return summary
+
+
+def order_items_prefetch():
+    """Load the items of a page of orders at once, without the products"""
+    return Prefetch(
+        "items",
+        queryset=OrderItem.objects.only(
+            "id",
+            "order_id",
+            "product_id",
+            "quantity",
+            "price",
+            "product_name",
+            "product_sku",
+            "product_image",
+        ).order_by("id"),
+    )
+
+
+def filter_order_status(queryset, params):
+    """Narrow orders to the ``status`` values given, repeated or comma separated"""
+    statuses = get_list_param(params, "status")
+    valid = {choice for choice, _label in Order.STATUS_CHOICES}
+    unknown = [value for value in statuses if value not in valid]
+    if unknown:
+        raise ValueError(f"Unknown status: {', '.join(unknown)}")
+    return queryset.filter(status__in=statuses) if statuses else queryset
+
+
+def _parse_moment(params, key):
+    """
+    A date or datetime parameter as (start moment, whole day). A plain date
+    stands for the whole day.
+    """
+    value = params.get(key)
+    if not value:
+        return None, False
+    whole_day = len(value) == 10
+    try:
+        if whole_day:
+            moment = datetime.combine(parse_date(value), time.min)
+        else:
+            moment = parse_datetime(value)
+    except (TypeError, ValueError):
+        moment = None
+    if moment is None:
+        raise ValueError(f"Invalid date for {key}: {value}")
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment, whole_day
+
+
+def filter_admin_orders(queryset, params):
+    """
+    Apply the staff order console filters: ``status``, ``payment_status``,
+    ``created_from``/``created_to`` (dates or datetimes, both inclusive for
+    dates), ``user`` (id or username) and ``order_number`` prefix.
+    """
+    queryset = filter_order_status(queryset, params)
+
+    payment_status = parse_bool(params.get("payment_status"))
+    if payment_status is not None:
+        queryset = queryset.filter(payment_status=payment_status)
+
+    created_from, _whole_day = _parse_moment(params, "created_from")
+    if created_from:
+        queryset = queryset.filter(created_at__gte=created_from)
+    created_to, whole_day = _parse_moment(params, "created_to")
+    if created_to and whole_day:
+        queryset = queryset.filter(created_at__lt=created_to + timedelta(days=1))
+    elif created_to:
+        queryset = queryset.filter(created_at__lte=created_to)
+
+    user = params.get("user", "").strip()
+    if user:
+        if user.isdigit():
+            queryset = queryset.filter(user_id=int(user))
+        else:
+            queryset = queryset.filter(user__username=user)
+
+    order_number = params.get("order_number", "").strip()
+    if order_number:
+        queryset = queryset.filter(order_number__startswith=order_number.upper())
+
+    return queryset
+
+
+def estimated_count(queryset, limit=EXACT_COUNT_LIMIT):
+    """
+    Number of rows in ``queryset`` and whether it is an estimate. Large
+    result sets take the planner's row estimate from EXPLAIN instead of
+    running COUNT(*); small ones are counted exactly.
+    """
+    if connection.vendor != "postgresql":
+        return queryset.count(), False
+    sql, params = queryset.order_by().values("id").query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    estimate = int(plan[0]["Plan"]["Plan Rows"])
+    if estimate > limit:
+        return estimate, True
+    return queryset.count(), False
+
+
+def parse_order_lines(items):
+    """
+    Validate the ``items`` of an order request into (product_id, quantity)
+    lines. Client supplied prices are ignored: lines are priced from the
+    catalog when the order is placed.
+    """
+    lines = []
+    for item in items:
+        try:
+            product_id = int(item.get("product_id"))
+            quantity = int(item.get("quantity", 1))
+        except (AttributeError, TypeError, ValueError):
+            raise ValueError("Each item needs an integer product_id and quantity")
+        if quantity < 1:
+            raise ValueError(f"Invalid quantity for product {product_id}")
+        lines.append((product_id, quantity))
+    return lines
+
+
+def quote_order(user, lines, from_cart=False):
+    """
+    Price (product_id, quantity) ``lines`` at the current effective prices
+    and check them against the stock, in one query.
+
+    The quote carries a signed token for create_order when every line can
+    be ordered, None otherwise. The token holds the user, the lines and
+    their unit prices and is honoured once, for ORDER_QUOTE_TTL seconds.
+    """
+    quantities = order_quantities(lines)
+    products = {
+        row["id"]: row
+        for row in Product.objects.filter(id__in=quantities)
+        .annotate(unit_price=effective_price(), available=available_stock())
+        .values(
+            "id",
+            "name",
+            "price",
+            "sale_price",
+            "unit_price",
+            "available",
+            "is_active",
+        )
+    }
+    items = []
+    total = Decimal("0.00")
+    orderable = True
+    for product_id, quantity in quantities.items():
+        product = products.get(product_id)
+        if product is None:
+            raise ValueError(f"Product with ID {product_id} not found")
+        in_stock = product["is_active"] and product["available"] >= quantity
+        orderable = orderable and in_stock
+        subtotal = product["unit_price"] * quantity
+        total += subtotal
+        items.append(
+            {
+                "product_id": product_id,
+                "name": product["name"],
+                "price": str(product["price"]),
+                "sale_price": None
+                if product["sale_price"] is None
+                else str(product["sale_price"]),
+                "unit_price": str(product["unit_price"]),
+                "quantity": quantity,
+                "subtotal": str(subtotal),
+                "available": product["available"] if product["is_active"] else 0,
+                "in_stock": in_stock,
+            }
+        )
+
+    token = expires_at = None
+    if orderable:
+        token = signing.dumps(
+            {
+                "user": user.pk,
+                "lines": [
+                    [item["product_id"], item["quantity"], item["unit_price"]]
+                    for item in items
+                ],
+                "cart": from_cart,
+            },
+            salt=QUOTE_SALT,
+            compress=True,
+        )
+        expires_at = timezone.now() + timedelta(seconds=settings.ORDER_QUOTE_TTL)
+    return {
+        "items": items,
+        "item_count": sum(quantities.values()),
+        "total": str(total),
+        "orderable": orderable,
+        "quote": token,
+        "expires_at": expires_at,
+    }
+
+
+def read_quote(token, user):
+    """
+    The lines, unit prices and cart flag of a quote token issued to
+    ``user``. Raises ValueError once the token has expired or when it
+    was not issued to this user.
+    """
+    try:
+        quote = signing.loads(token, salt=QUOTE_SALT, max_age=settings.ORDER_QUOTE_TTL)
+    except signing.SignatureExpired:
+        raise ValueError("Quote has expired")
+    except signing.BadSignature:
+        raise ValueError("Invalid quote")
+    if quote.get("user") != user.pk:
+        raise ValueError("Invalid quote")
+    lines = [(product_id, quantity) for product_id, quantity, _price in quote["lines"]]
+    prices = {
+        product_id: Decimal(price) for product_id, _quantity, price in quote["lines"]
+    }
+    return lines, prices, quote["cart"]
+
+
+def use_quote(token, user):
+    """
+    Record that a quote token placed an order, in the transaction placing
+    it. Raises ValueError when the token was already used, so that a quote
+    places one order only.
+    """
+    try:
+        with transaction.atomic():
+            UsedQuote.objects.create(
+                user=user,
+                digest=hashlib.sha256(token.encode()).hexdigest(),
+                expires_at=timezone.now() + timedelta(seconds=settings.ORDER_QUOTE_TTL),
+            )
+    except IntegrityError:
+        raise ValueError("Quote was already used")
+
+
+def place_order(user, shipping_address, lines, prices=None):
+    """
+    Create an order for (product_id, quantity) ``lines`` priced at the
+    current effective price, or at the unit ``prices`` of a quote when
+    given, in a fixed number of queries whatever the number of lines. The
+    items keep a copy of the product name, slug and image as they are now.
+    The stock stays held for the order until it is paid or the hold
+    expires. Raises ValueError when a product is missing, no longer sold or
+    short of stock, leaving nothing changed.
+    """
+    with transaction.atomic():
+        quantities = order_quantities(lines)
+        products = take_stock(quantities)
+        # A quote may have been issued before the product was withdrawn
+        for product_id in quantities:
+            if not products[product_id]["is_active"]:
+                raise ValueError(f"{products[product_id]['name']} is no longer sold")
+        if prices is None:
+            prices = {
+                product_id: product["sale_price"]
+                if product["sale_price"] is not None
+                else product["price"]
+                for product_id, product in products.items()
+            }
+        order = Order.objects.create(
+            user=user,
+            order_number=f"ORD-{uuid.uuid4().hex[:ORDER_NUMBER_LENGTH].upper()}",
+            shipping_address=shipping_address,
+            total_amount=sum(
+                (prices[product_id] * quantity for product_id, quantity in lines),
+                Decimal("0.00"),
+            ),
+            payment_status=False,
+            item_count=sum(quantity for _product_id, quantity in lines),
+            summary=order_summary(
+                [
+                    (products[product_id]["name"], quantity)
+                    for product_id, quantity in lines
+                ]
+            ),
+        )
+        OrderItem.objects.bulk_create(
+            [
+                OrderItem(
+                    order=order,
+                    product_id=product_id,
+                    quantity=quantity,
+                    price=prices[product_id],
+                    product_name=products[product_id]["name"],
+                    product_sku=products[product_id]["slug"],
+                    product_image=products[product_id]["image_url"],
+                    category_key=products[product_id]["category_id"] or 0,
+                    created_at=order.created_at,
+                )
+                for product_id, quantity in lines
+            ]
+        )
+        record_movements("sale", quantities, order=order, sign=-1)
+        hold_stock(order, quantities)
+        record_order_sales(
+            {
+                order.id: (
+                    order.created_at,
+                    order.status,
+                    order.total_amount,
+                    order.item_count,
+                )
+            },
+            [
+                (
+                    order.id,
+                    product_id,
+                    products[product_id]["category_id"],
+                    quantity,
+                    prices[product_id],
+                )
+                for product_id, quantity in lines
+            ],
+        )
+        invalidate_admin_stats("orders")
+    return order
+
+
+def parse_order_ids(values):
+    """Validate the ``order_ids`` of a bulk request, keeping their order"""
+    if not isinstance(values, list) or not values:
+        raise ValueError("order_ids must be a non-empty list")
+    try:
+        ids = list(dict.fromkeys(int(value) for value in values))
+    except (TypeError, ValueError):
+        raise ValueError("order_ids must be integers")
+    if len(ids) > MAX_BULK_ORDERS:
+        raise ValueError(f"At most {MAX_BULK_ORDERS} order_ids per request")
+    return ids
+
+
+def transition_orders(order_ids, target):
+    """
+    Move orders to the ``target`` status where Order.STATUS_TRANSITIONS
+    allows it, in one transaction: one locking read and one UPDATE for
+    all of them. Cancelled orders give their stock back, paid or not;
+    orders leaving ``pending`` for fulfilment turn their holds into sales,
+    failing with ValueError when released stock has been sold since.
+
+    Returns one outcome per id, in the order given: ``updated``,
+    ``unchanged`` (already there), ``invalid_transition`` or ``not_found``.
+    """
+    if target not in Order.STATUS_TRANSITIONS:
+        raise ValueError(f"Unknown status: {target}")
+
+    with transaction.atomic():
+        current = dict(
+            Order.objects.select_for_update()
+            .filter(id__in=order_ids)
+            .order_by("id")
+            .values_list("id", "status")
+        )
+        outcomes = []
+        updated = []
+        for order_id in order_ids:
+            status = current.get(order_id)
+            outcome = {"id": order_id, "from": status}
+            if status is None:
+                outcome["result"] = "not_found"
+            elif status == target:
+                outcome["result"] = "unchanged"
+            elif target not in Order.STATUS_TRANSITIONS[status]:
+                outcome["result"] = "invalid_transition"
+            else:
+                outcome["result"] = "updated"
+                updated.append(order_id)
+            outcomes.append(outcome)
+
+        if updated:
+            Order.objects.filter(id__in=updated).update(
+                status=target, updated_at=timezone.now()
+            )
+            if target == "cancelled":
+                release_order_reservations(updated)
+            elif target in ("processing", "shipped"):
+                commit_order_reservations(
+                    [order_id for order_id in updated if current[order_id] == "pending"]
+                )
+            move_order_sales(
+                {order_id: current[order_id] for order_id in updated}, target
+            )
+            invalidate_admin_stats("orders")
+    return outcomes
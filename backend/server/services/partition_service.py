@@ -0,0 +1,147 @@
+import gzip
+import re
+from datetime import date, datetime, timezone
+
+from django.db import connection, transaction
+
+from ..models import InventoryMovement, Order, OrderItem, StockReservation
+from .stats_service import invalidate_admin_stats
+
+# Tables migration 0017 partitions by month of created_at, when
+# ORDER_PARTITIONING is on. Items take the created_at of their order, so
+# the partitions of one month hold whole orders.
+PARTITIONED_MODELS = (Order, OrderItem)
+
+
+def month_start(moment):
+    return date(moment.year, moment.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y_%m}"
+
+
+def month_moment(month):
+    """Start of ``month`` in UTC, where partition bounds fall"""
+    return datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+
+
+def _bound(month):
+    return f"'{month_moment(month).isoformat()}'"
+
+
+def is_partitioned(table):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)",
+            [table],
+        )
+        return cursor.fetchone() is not None
+
+
+def monthly_partitions(table):
+    """The monthly partitions of ``table`` as {first day of month: name}"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = %s::regclass
+            """,
+            [table],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    pattern = re.compile(rf"^{re.escape(table)}_p(\d{{4}})_(\d{{2}})$")
+    partitions = {}
+    for name in names:
+        match = pattern.match(name)
+        if match:
+            partitions[date(int(match[1]), int(match[2]), 1)] = name
+    return partitions
+
+
+def default_months(table):
+    """Months that have rows in the default partition of ``table``"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT DISTINCT date_trunc('month', created_at AT TIME ZONE 'UTC') "
+            f"FROM {table}_default"
+        )
+        return sorted(month_start(row[0]) for row in cursor.fetchall())
+
+
+def create_partition(table, month):
+    """
+    Add the partition of ``table`` holding ``month``. Rows of that month
+    that landed in the default partition meanwhile are moved into it.
+    """
+    name = partition_name(table, month)
+    lower, upper = _bound(month), _bound(add_months(month, 1))
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS "
+            f"INCLUDING CONSTRAINTS)"
+        )
+        cursor.execute(
+            f"""
+            WITH moved AS (
+                DELETE FROM {table}_default
+                WHERE created_at >= {lower} AND created_at < {upper}
+                RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+            """
+        )
+        cursor.execute(
+            f"ALTER TABLE {table} ATTACH PARTITION {name} "
+            f"FOR VALUES FROM ({lower}) TO ({upper})"
+        )
+    return name
+
+
+def export_partition(name, path):
+    """Write the rows of partition ``name`` to a gzipped CSV file at ``path``"""
+    with gzip.open(path, "wb") as output, connection.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY (SELECT * FROM {name} ORDER BY id) TO STDOUT WITH (FORMAT csv, HEADER)",
+            output,
+        )
+
+
+def archive_month(month, directory=None):
+    """
+    Take the orders and order items of ``month`` out of the live tables.
+    With a ``directory`` each partition is exported there as
+    ``<partition>.csv.gz`` and dropped; without one it is only detached and
+    stays in the database as a plain table.
+
+    Reservations of the archived orders are deleted and their inventory
+    movements keep no order, as deleting the orders would have done.
+    """
+    orders = Order.objects.filter(
+        created_at__gte=month_moment(month),
+        created_at__lt=month_moment(add_months(month, 1)),
+    ).values("id")
+    archived = []
+    with transaction.atomic():
+        StockReservation.objects.filter(order_id__in=orders).delete()
+        InventoryMovement.objects.filter(order_id__in=orders).update(order=None)
+        for model in PARTITIONED_MODELS:
+            table = model._meta.db_table
+            name = monthly_partitions(table).get(month)
+            if name is None:
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+            if directory is not None:
+                export_partition(name, directory / f"{name}.csv.gz")
+                with connection.cursor() as cursor:
+                    cursor.execute(f"DROP TABLE {name}")
+            archived.append(name)
+        invalidate_admin_stats("orders")
+    return archived
@@ -0,0 +1,42 @@
+from django.db.models import Sum
+
+from ..models import OrderItem, Product
+
+# How many of a customer's latest purchased products seed their
+# "frequently bought together" list
+RECENT_PURCHASES = 20
+
+MAX_RECOMMENDATIONS = 50
+
+
+def recent_purchases(user, limit=RECENT_PURCHASES):
+    """Ids of the products in the user's latest orders, newest first"""
+    rows = (
+        OrderItem.objects.filter(order__user=user)
+        .exclude(order__status="cancelled")
+        .order_by("-order__created_at", "-id")
+        .values_list("product_id", flat=True)[: limit * 4]
+    )
+    return list(dict.fromkeys(rows))[:limit]
+
+
+def recommended_products(seeds, kind="co_purchase", limit=10):
+    """
+    Active products most related to the ``seeds`` product ids, best first.
+
+    Reads the precomputed ProductNeighbor rows of the seeds in one query,
+    summing the scores of products related to several seeds. Seeds are
+    never recommended back.
+    """
+    if not seeds:
+        return Product.objects.none()
+    return (
+        Product.objects.filter(
+            is_active=True,
+            neighbor_of__kind=kind,
+            neighbor_of__product_id__in=seeds,
+        )
+        .exclude(id__in=seeds)
+        .annotate(score=Sum("neighbor_of__score"))
+        .order_by("-score", "id")[: max(1, min(limit, MAX_RECOMMENDATIONS))]
+    )
@@ -0,0 +1,269 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from ..models import (
+    DailyCategorySales,
+    DailyProductSales,
+    DailySales,
+    Order,
+    OrderItem,
+)
+
+# Each rollup table and the fields its rows are keyed by
+ROLLUPS = (
+    (DailySales, ("day", "status")),
+    (DailyCategorySales, ("category_key", "day", "status")),
+    (DailyProductSales, ("product_id", "day", "status")),
+)
+MEASURES = ("orders", "units", "revenue")
+
+MAX_TIMESERIES_DAYS = 3660
+
+
+def _add(rows, key, orders, units, revenue):
+    totals = rows.setdefault(key, [0, 0, Decimal("0.00")])
+    totals[0] += orders
+    totals[1] += units
+    totals[2] += revenue
+
+
+def sales_contributions(orders, items, sign=1, deltas=None):
+    """
+    What orders add to each rollup, as one {key: [orders, units, revenue]}
+    per entry of ROLLUPS.
+
+    ``orders`` maps order ids to (created_at, status, total_amount,
+    item_count); ``items`` holds (order_id, product_id, category_id,
+    quantity, price) rows. With ``sign`` -1 the contributions are taken
+    away, and ``deltas`` from an earlier call are added to.
+    """
+    if deltas is None:
+        deltas = tuple({} for _rollup in ROLLUPS)
+    daily, by_category, by_product = deltas
+    counted = set()
+    for order_id, product_id, category_id, quantity, price in items:
+        created_at, status, _total, _count = orders[order_id]
+        day = timezone.localdate(created_at)
+        for name, rows, key in (
+            ("category", by_category, (category_id or 0, day, status)),
+            ("product", by_product, (product_id, day, status)),
+        ):
+            # An order counts once per category and product, whatever the
+            # number of its lines
+            first = (order_id, name, key) not in counted
+            counted.add((order_id, name, key))
+            _add(rows, key, sign * first, sign * quantity, sign * price * quantity)
+    for created_at, status, total, item_count in orders.values():
+        day = timezone.localdate(created_at)
+        _add(daily, (day, status), sign, sign * item_count, sign * total)
+    return deltas
+
+
+def load_order_sales(order_ids):
+    """The ``orders`` and ``items`` of sales_contributions, in two queries"""
+    orders = {
+        order_id: (created_at, status, total, item_count)
+        for order_id, created_at, status, total, item_count in Order.objects.filter(
+            id__in=order_ids
+        ).values_list("id", "created_at", "status", "total_amount", "item_count")
+    }
+    items = list(
+        OrderItem.objects.filter(order_id__in=order_ids).values_list(
+            "order_id", "product_id", "category_key", "quantity", "price"
+        )
+    )
+    return orders, items
+
+
+def apply_sales_deltas(deltas):
+    """
+    Add the contributions to the rollup tables with one upsert per table.
+    Keys are written in sorted order so that concurrent writers lock the
+    rows in the same order.
+    """
+    with connection.cursor() as cursor:
+        for (model, keys), rows in zip(ROLLUPS, deltas):
+            rows = sorted((key, totals) for key, totals in rows.items() if any(totals))
+            if not rows:
+                continue
+            table = model._meta.db_table
+            columns = ", ".join((*keys, *MEASURES))
+            placeholders = ", ".join(["%s"] * (len(keys) + len(MEASURES)))
+            updates = ", ".join(
+                f"{measure} = {table}.{measure} + EXCLUDED.{measure}"
+                for measure in MEASURES
+            )
+            cursor.execute(
+                f"INSERT INTO {table} ({columns}) VALUES "
+                + ", ".join(f"({placeholders})" for _row in rows)
+                + f" ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {updates}",
+                [value for key, totals in rows for value in (*key, *totals)],
+            )
+
+
+def record_order_sales(orders, items):
+    """Count newly placed orders in the rollups"""
+    apply_sales_deltas(sales_contributions(orders, items))
+
+
+def move_order_sales(previous_statuses, target):
+    """
+    Move orders from the rollup rows of their ``previous_statuses``
+    ({order_id: status}) to the rows of the ``target`` status.
+
+    The previous statuses must come from a read of the orders locked until
+    the status change commits, as in transition_orders and process_payment;
+    otherwise two concurrent changes both move the order away from the same
+    status and the rollups drift.
+    """
+    previous_statuses = {
+        order_id: status
+        for order_id, status in previous_statuses.items()
+        if status != target
+    }
+    if not previous_statuses:
+        return
+    orders, items = load_order_sales(list(previous_statuses))
+    before = {
+        order_id: (created_at, previous_statuses[order_id], total, count)
+        for order_id, (created_at, _status, total, count) in orders.items()
+    }
+    after = {
+        order_id: (created_at, target, total, count)
+        for order_id, (created_at, _status, total, count) in orders.items()
+    }
+    deltas = sales_contributions(before, items, sign=-1)
+    apply_sales_deltas(sales_contributions(after, items, deltas=deltas))
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def expected_sales_rollups(start, end):
+    """Rollup rows of the days ``start`` to ``end`` counted from the orders"""
+    orders = Order.objects.filter(
+        created_at__gte=_day_start(start),
+        created_at__lt=_day_start(end + timedelta(days=1)),
+    )
+    items = OrderItem.objects.filter(order__in=orders.values("id"))
+    item_measures = {
+        "units": Sum("quantity"),
+        "revenue": Sum(F("price") * F("quantity")),
+        "orders": Count("order_id", distinct=True),
+    }
+    queries = (
+        orders.annotate(day=TruncDate("created_at"))
+        .values("day", "status")
+        .annotate(
+            orders=Count("id"), units=Sum("item_count"), revenue=Sum("total_amount")
+        ),
+        items.annotate(day=TruncDate("order__created_at"), status=F("order__status"))
+        .values("category_key", "day", "status")
+        .annotate(**item_measures),
+        items.annotate(day=TruncDate("order__created_at"), status=F("order__status"))
+        .values("product_id", "day", "status")
+        .annotate(**item_measures),
+    )
+    return tuple(
+        {
+            tuple(row[key] for key in keys): [row[measure] for measure in MEASURES]
+            for row in query.order_by()
+        }
+        for (_model, keys), query in zip(ROLLUPS, queries)
+    )
+
+
+def stored_sales_rollups(start, end):
+    return tuple(
+        {
+            tuple(row[:-3]): list(row[-3:])
+            for row in model.objects.filter(day__range=(start, end)).values_list(
+                *keys, *MEASURES
+            )
+            if any(row[-3:])
+        }
+        for model, keys in ROLLUPS
+    )
+
+
+def sales_rollup_drift(expected, stored):
+    """Rows whose stored totals differ, as [(table, key, expected, stored)]"""
+    drift = []
+    for (model, _keys), wanted, found in zip(ROLLUPS, expected, stored):
+        for key in sorted(set(wanted) | set(found)):
+            if wanted.get(key) != found.get(key):
+                drift.append(
+                    (model._meta.db_table, key, wanted.get(key), found.get(key))
+                )
+    return drift
+
+
+def rebuild_sales_rollups(start, end):
+    """
+    Replace the rollup rows of the days ``start`` to ``end`` with a fresh
+    count of the orders. Sales are attributed to the category each item
+    was ordered in.
+    """
+    with transaction.atomic():
+        if connection.vendor == "postgresql":
+            # Incremental updates wait until the new rows are in place
+            with connection.cursor() as cursor:
+                for model, _keys in ROLLUPS:
+                    cursor.execute(
+                        f"LOCK TABLE {model._meta.db_table} IN EXCLUSIVE MODE"
+                    )
+        expected = expected_sales_rollups(start, end)
+        for (model, keys), rows in zip(ROLLUPS, expected):
+            model.objects.filter(day__range=(start, end)).delete()
+            model.objects.bulk_create(
+                [
+                    model(
+                        **dict(zip(keys, key)),
+                        **dict(zip(MEASURES, totals)),
+                    )
+                    for key, totals in rows.items()
+                ],
+                batch_size=1000,
+            )
+    return expected
+
+
+def sales_timeseries(start, end, statuses, category_id=None, product_id=None):
+    """
+    Orders, units and revenue per day from ``start`` to ``end``, read from
+    the rollup of the whole shop, one category or one product. Days
+    without sales are filled with zeros.
+    """
+    if product_id is not None:
+        rows = DailyProductSales.objects.filter(product_id=product_id)
+    elif category_id is not None:
+        rows = DailyCategorySales.objects.filter(category_key=category_id)
+    else:
+        rows = DailySales.objects.all()
+    totals = {
+        row["day"]: row
+        for row in rows.filter(day__range=(start, end), status__in=statuses)
+        .values("day")
+        .annotate(orders=Sum("orders"), units=Sum("units"), revenue=Sum("revenue"))
+        .order_by()
+    }
+    series = []
+    day = start
+    while day <= end:
+        row = totals.get(day, {})
+        series.append(
+            {
+                "date": day,
+                "orders": row.get("orders", 0),
+                "units": row.get("units", 0),
+                "revenue": str(row.get("revenue", Decimal("0.00"))),
+            }
+        )
+        day += timedelta(days=1)
+    return series
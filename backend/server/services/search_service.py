@@ -0,0 +1,71 @@
+from django.contrib.postgres.search import SearchRank, TrigramWordSimilarity
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+
+from .catalog_service import SORT_ORDERINGS, paginate_keyset, search_query
+
+# Ranked sorts are only meaningful on search results, which carry a rank
+# annotation: ts_rank for full-text matches, trigram similarity for fuzzy ones.
+# Both are float4 in Postgres and are cast to double precision so that the
+# value round-trips through the cursor exactly.
+SEARCH_SORTS = {
+    **SORT_ORDERINGS,
+    "relevance": ("-rank", "-id"),
+}
+FUZZY_SORTS = {
+    **SORT_ORDERINGS,
+    "similarity": ("-rank", "-id"),
+}
+
+
+def fulltext_products(queryset, text):
+    query = search_query(text)
+    return queryset.filter(search_vector=query).annotate(
+        rank=Cast(SearchRank(F("search_vector"), query), FloatField())
+    )
+
+
+def fuzzy_products(queryset, text):
+    """Products whose name is close to ``text``, to catch typos"""
+    return queryset.filter(name__trigram_word_similar=text).annotate(
+        rank=Cast(TrigramWordSimilarity(text, "name"), FloatField())
+    )
+
+
+def search_products(queryset, text, params, fields=None):
+    """
+    Return one page of products matching ``text`` and the next cursor.
+
+    Full-text results are ranked with ts_rank over the weighted search
+    vector. When the first page of a full-text search comes back empty, or
+    the client asks for ``mode=fuzzy``, the search switches to trigram
+    similarity on the product name. The mode used is returned so that the
+    client can pass it back along with the cursor.
+    """
+    mode = params.get("mode") or "fulltext"
+    if mode not in ("fulltext", "fuzzy"):
+        raise ValueError(f"Unknown search mode: {mode}")
+
+    if mode == "fulltext":
+        page, next_cursor = paginate_keyset(
+            fulltext_products(queryset, text),
+            params,
+            sorts=SEARCH_SORTS,
+            default_sort="relevance",
+            fields=fields,
+        )
+        if page or params.get("cursor"):
+            return page, next_cursor, mode
+        mode = "fuzzy"
+
+    params = params.copy()
+    if params.get("sort") == "relevance":
+        params["sort"] = "similarity"
+    page, next_cursor = paginate_keyset(
+        fuzzy_products(queryset, text),
+        params,
+        sorts=FUZZY_SORTS,
+        default_sort="similarity",
+        fields=fields,
+    )
+    return page, next_cursor, mode
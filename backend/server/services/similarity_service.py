@@ -0,0 +1,209 @@
+"""
+Offline item-item similarity math for the recommendation builders. Kept
+apart from the request path so that only management commands need NumPy.
+"""
+
+import re
+from collections import Counter
+
+import numpy as np
+
+from .catalog_service import connection_key, price_bucket, split_connections
+
+
+def top_n_per_row(rows, cols, scores, top_n):
+    """
+    Keep the ``top_n`` highest scores of every row of a sparse matrix given
+    as parallel (rows, cols, scores) arrays. Returns the kept entries
+    grouped by row, best first, with their 0-based rank.
+    """
+    order = np.lexsort((cols, -scores, rows))
+    rows, cols, scores = rows[order], cols[order], scores[order]
+    rank = np.arange(len(rows)) - np.searchsorted(rows, rows, side="left")
+    keep = rank < top_n
+    return rows[keep], cols[keep], scores[keep], rank[keep]
+
+
+def co_purchase_similarity(order_ids, product_ids, top_n, min_support=1):
+    """
+    Cosine similarity of products bought together.
+
+    ``order_ids`` and ``product_ids`` are parallel arrays of distinct
+    (order, product) pairs. Co-occurrence counts C = XᵀX of the sparse
+    order x product matrix X are built without materialising X: every
+    line is paired with every other line of its order via repeat/offset
+    index arithmetic, and the pairs are counted with np.unique. Scores are
+    C[i, j] / sqrt(n_i * n_j) with n_i the number of orders holding i.
+
+    Returns (product, neighbor, score, rank) arrays of the ``top_n``
+    neighbours of every product.
+    """
+    empty = np.array([], dtype=np.int64)
+    if len(product_ids) == 0:
+        return empty, empty, np.array([], dtype=np.float64), empty
+
+    products, p = np.unique(product_ids, return_inverse=True)
+    _, o = np.unique(order_ids, return_inverse=True)
+    by_order = np.argsort(o, kind="stable")
+    o, p = o[by_order], p[by_order]
+
+    order_sizes = np.bincount(o)
+    order_starts = np.cumsum(order_sizes) - order_sizes
+    pairs_per_line = order_sizes[o]
+    left = np.repeat(np.arange(len(p)), pairs_per_line)
+    offsets = np.arange(len(left)) - np.repeat(
+        np.cumsum(pairs_per_line) - pairs_per_line, pairs_per_line
+    )
+    right = np.repeat(order_starts[o], pairs_per_line) + offsets
+
+    a, b = p[left], p[right]
+    distinct = a != b
+    n = len(products)
+    keys, counts = np.unique(
+        a[distinct].astype(np.int64) * n + b[distinct], return_counts=True
+    )
+    rows, cols = keys // n, keys % n
+
+    supported = counts >= min_support
+    rows, cols, counts = rows[supported], cols[supported], counts[supported]
+    orders_per_product = np.bincount(p, minlength=n).astype(np.float64)
+    scores = counts / np.sqrt(orders_per_product[rows] * orders_per_product[cols])
+
+    rows, cols, scores, rank = top_n_per_row(rows, cols, scores, top_n)
+    return products[rows], products[cols], scores, rank
+
+
+# Relative weight of each feature block in the content similarity. Blocks
+# are normalised separately, so a weight is the most that block can add.
+FEATURE_WEIGHTS = {
+    "category": 0.35,
+    "brand": 0.2,
+    "connections": 0.15,
+    "price": 0.15,
+    "description": 0.15,
+}
+MAX_TERMS = 1000
+# Terms in more than this share of descriptions say nothing about a product
+MAX_TERM_SHARE = 0.5
+BATCH_SIZE = 512
+
+_TERM_RE = re.compile(r"[a-z0-9]{3,}")
+
+
+def _one_hot(values):
+    """(n, distinct values) indicator matrix; None values stay all zero"""
+    vocabulary = {value: i for i, value in enumerate(sorted({v for v in values if v}))}
+    matrix = np.zeros((len(values), len(vocabulary)), dtype=np.float32)
+    for row, value in enumerate(values):
+        if value:
+            matrix[row, vocabulary[value]] = 1
+    return matrix
+
+
+def _multi_hot(value_lists):
+    vocabulary = {
+        value: i
+        for i, value in enumerate(sorted({v for values in value_lists for v in values}))
+    }
+    matrix = np.zeros((len(value_lists), len(vocabulary)), dtype=np.float32)
+    for row, values in enumerate(value_lists):
+        for value in values:
+            matrix[row, vocabulary[value]] = 1
+    return matrix
+
+
+def _term_weights(descriptions):
+    """TF-IDF of description terms, keeping the MAX_TERMS most common"""
+    documents = [
+        Counter(_TERM_RE.findall((text or "").lower())) for text in descriptions
+    ]
+    document_frequency = Counter(term for terms in documents for term in terms)
+    limit = max(2, MAX_TERM_SHARE * len(documents))
+    common = [
+        term for term, count in document_frequency.most_common() if 2 <= count <= limit
+    ][:MAX_TERMS]
+    vocabulary = {term: i for i, term in enumerate(common)}
+    matrix = np.zeros((len(documents), len(vocabulary)), dtype=np.float32)
+    for row, terms in enumerate(documents):
+        for term, count in terms.items():
+            column = vocabulary.get(term)
+            if column is not None:
+                matrix[row, column] = 1 + np.log(count)
+    idf = np.log(len(documents) / np.array([document_frequency[t] for t in common]))
+    return matrix * idf.astype(np.float32)
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+def product_features(rows):
+    """
+    Unit-length content vectors for products given as (category_id, brand,
+    connections, price, sale_price, description) rows: one-hot category,
+    brand and price band, multi-hot connection types and TF-IDF description
+    terms, each block normalised and scaled by FEATURE_WEIGHTS.
+    """
+    categories, brands, connections, prices, sale_prices, descriptions = (
+        zip(*rows) if rows else ([],) * 6
+    )
+    blocks = {
+        "category": _one_hot(categories),
+        "brand": _one_hot([connection_key(brand or "") for brand in brands]),
+        "connections": _multi_hot(
+            [
+                {connection_key(name) for name in split_connections(value)}
+                for value in connections
+            ]
+        ),
+        "price": _one_hot(
+            [
+                price_bucket(sale if sale is not None else price)
+                for price, sale in zip(prices, sale_prices)
+            ]
+        ),
+        "description": _term_weights(descriptions),
+    }
+    matrix = np.hstack(
+        [
+            _normalize_rows(blocks[name]) * np.float32(np.sqrt(weight))
+            for name, weight in FEATURE_WEIGHTS.items()
+        ]
+    )
+    return _normalize_rows(matrix)
+
+
+def top_k_similar(features, rows, k, batch_size=BATCH_SIZE):
+    """
+    The ``k`` most similar products to each of ``rows`` (indexes into
+    ``features``) by cosine similarity, computed one block of rows at a
+    time against the whole matrix. Products are never their own neighbour
+    and zero similarities are dropped; ties go to the lower index.
+
+    Returns parallel (row, neighbor, score, rank) arrays of indexes.
+    """
+    out = [], [], [], []
+    rows = np.asarray(rows, dtype=np.int64)
+    k = min(k, len(features) - 1)
+    if k <= 0 or len(rows) == 0:
+        return tuple(np.array(part, dtype=np.int64) for part in out)
+    for start in range(0, len(rows), batch_size):
+        block = rows[start : start + batch_size]
+        scores = features[block] @ features.T
+        scores[np.arange(len(block)), block] = -1
+        # Everything tied with the k-th best score is a candidate, so that
+        # ties are broken by position and not by argpartition's choice
+        kth = -np.partition(-scores, k - 1, axis=1)[:, k - 1 : k]
+        candidate_rows, neighbors = np.nonzero((scores >= kth) & (scores > 0))
+        for part, values in zip(
+            out,
+            top_n_per_row(
+                block[candidate_rows],
+                neighbors,
+                scores[candidate_rows, neighbors],
+                k,
+            ),
+        ):
+            part.append(values)
+    return tuple(np.concatenate(part) for part in out)
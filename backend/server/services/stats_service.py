@@ -0,0 +1,108 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from ..models import Order, Product
+from ..models.user_model import Customer
+
+DEFAULT_STATS_DAYS = 30
+LOW_STOCK_THRESHOLD = 10
+
+
+def _generation_key(table):
+    return f"admin-stats-generation:{table}"
+
+
+def invalidate_admin_stats(*tables):
+    """
+    Make the cached dashboard stats of ``tables`` ("orders", "products")
+    stale once the current transaction commits. Every cached entry of a
+    table carries its generation in the key, so bumping it retires the
+    entries of every ``days`` window at once. The generation lives in the
+    shared cache (settings.CACHES), so the bump reaches every worker; two
+    concurrent bumps may count as one, which still retires the entries.
+
+    A transaction bumps each table once, however many of its writes call
+    this: later calls add their tables to the bump already waiting.
+    """
+    for _savepoints, func, _robust in transaction.get_connection().run_on_commit:
+        pending = getattr(func, "admin_stats_tables", None)
+        if pending is not None:
+            pending.update(tables)
+            return
+
+    def bump():
+        for table in sorted(bump.admin_stats_tables):
+            try:
+                cache.incr(_generation_key(table))
+            except ValueError:
+                cache.set(_generation_key(table), 1, None)
+
+    bump.admin_stats_tables = set(tables)
+    transaction.on_commit(bump)
+
+
+def _cached(table, suffix, compute):
+    generation = cache.get_or_set(_generation_key(table), 0, None)
+    key = f"admin-stats:{table}:{generation}:{suffix}"
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute()
+        cache.set(key, stats, settings.ADMIN_STATS_TTL)
+    return stats
+
+
+def parse_days(value):
+    if value in (None, ""):
+        return DEFAULT_STATS_DAYS
+    try:
+        days = int(value)
+    except ValueError:
+        days = 0
+    if days < 1:
+        raise ValueError("days must be a positive integer")
+    return days
+
+
+def order_stats(days=DEFAULT_STATS_DAYS):
+    """Sales and order counts of the last ``days`` days, in one query"""
+
+    def compute():
+        recent = Q(created_at__gte=timezone.now() - timedelta(days=days))
+        stats = Order.objects.aggregate(
+            total_sales=Sum("total_amount", filter=recent & Q(status="delivered")),
+            total_orders=Count("id", filter=recent),
+            pending_orders=Count("id", filter=Q(status="pending")),
+        )
+        stats["total_sales"] = stats["total_sales"] or 0
+        return stats
+
+    return _cached("orders", days, compute)
+
+
+def product_stats():
+    """Catalog size and products running low, in one query"""
+    # inventory_service invalidates these stats, so it is imported late
+    from .inventory_service import available_stock
+
+    return _cached(
+        "products",
+        "all",
+        lambda: Product.objects.annotate(available=available_stock()).aggregate(
+            total_products=Count("id"),
+            low_stock_products=Count("id", filter=Q(available__lt=LOW_STOCK_THRESHOLD)),
+        ),
+    )
+
+
+def customer_stats():
+    """Number of customers; not invalidated, it only expires"""
+    return _cached(
+        "customers",
+        "all",
+        lambda: Customer.objects.aggregate(total_customers=Count("id")),
+    )
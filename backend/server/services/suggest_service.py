@@ -0,0 +1,262 @@
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import Count, Max, Q, Sum
+from django.db.models.functions import Coalesce
+
+from ..models import Category, Product
+
+# Changed products are pulled in at most this often per process, and the
+# whole index (popularity, categories, deletions from other processes) is
+# rebuilt at the slower interval. Both run off the request path.
+REFRESH_SECONDS = 60
+FULL_REBUILD_SECONDS = 15 * 60
+# Rows committed slightly after their updated_at still get picked up
+WATERMARK_SKEW = timedelta(seconds=5)
+
+MAX_SUGGESTIONS = 20
+
+# Product fields shown in or deciding on a product's suggestion
+SUGGEST_FIELDS = ("name", "slug", "brand", "category", "is_active")
+
+
+def normalize(text):
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(text.lower().split())
+
+
+def prefix_terms(label):
+    """Index a label under every word it contains, so "wh" finds "Sony WH-1000XM4" """
+    words = re.split(r"\s+", normalize(label))
+    return {" ".join(words[i:]) for i in range(len(words)) if words[i]}
+
+
+class _State:
+    """
+    The index data. ``keys`` is a sorted list of (term, kind, ref) and a
+    prefix lookup is the bisect range of the prefix in it. ``items`` holds
+    the payload and weight of each (kind, ref).
+    """
+
+    def __init__(self):
+        self.keys = []
+        self.items = {}
+        # normalized brand -> [number of active products, summed popularity]
+        self.brands = {}
+        self._bulk = False
+
+    def _insert(self, kind, ref, label, payload):
+        self.items[(kind, ref)] = payload
+        for term in prefix_terms(label):
+            if self._bulk:
+                self.keys.append((term, kind, ref))
+            else:
+                insort(self.keys, (term, kind, ref))
+
+    def _delete(self, kind, ref):
+        payload = self.items.pop((kind, ref), None)
+        if payload is None:
+            return None
+        for term in prefix_terms(payload["label"]):
+            key = (term, kind, ref)
+            index = bisect_left(self.keys, key)
+            if index < len(self.keys) and self.keys[index] == key:
+                del self.keys[index]
+        return payload
+
+    def add_product(self, product_id, name, slug, brand, category, popularity):
+        self._insert(
+            "product",
+            product_id,
+            name,
+            {
+                "type": "product",
+                "label": name,
+                "id": product_id,
+                "slug": slug,
+                "category": category,
+                "brand": brand,
+                "weight": popularity,
+            },
+        )
+        ref = normalize(brand)
+        if not ref:
+            return
+        count, weight = self.brands.get(ref, (0, 0))
+        self.brands[ref] = (count + 1, weight + popularity)
+        if count == 0:
+            self._insert("brand", ref, brand, {"type": "brand", "label": brand})
+        self.items[("brand", ref)]["weight"] = weight + popularity + count + 1
+
+    def remove_product(self, product_id):
+        payload = self._delete("product", product_id)
+        if payload is None:
+            return None
+        ref = normalize(payload["brand"])
+        if ref in self.brands:
+            count, weight = self.brands[ref]
+            count, weight = count - 1, weight - payload["weight"]
+            if count <= 0:
+                del self.brands[ref]
+                self._delete("brand", ref)
+            else:
+                self.brands[ref] = (count, weight)
+                self.items[("brand", ref)]["weight"] = weight + count
+        return payload
+
+    def add_category(self, slug, name, product_count):
+        self._insert(
+            "category",
+            slug,
+            name,
+            {"type": "category", "label": name, "slug": slug, "weight": product_count},
+        )
+
+    def bulk_load(self, products, categories):
+        self._bulk = True
+        for product in products:
+            self.add_product(*product)
+        for category in categories:
+            self.add_category(*category)
+        self.keys.sort()
+        self._bulk = False
+
+    def search(self, prefix, limit):
+        start = bisect_left(self.keys, (prefix,))
+        end = bisect_left(self.keys, (prefix + "\uffff",), lo=start)
+        matches = {
+            (kind, ref): self.items[(kind, ref)]
+            for _term, kind, ref in self.keys[start:end]
+        }
+        best = heapq.nlargest(
+            limit,
+            matches.values(),
+            key=lambda item: (item["weight"], item["label"]),
+        )
+        return [
+            {
+                key: value
+                for key, value in item.items()
+                if key not in ("weight", "brand")
+            }
+            for item in best
+        ]
+
+
+class SuggestIndex:
+    """
+    Per-process prefix index over product names, brands and category names,
+    ranked by popularity (units sold). Lookups never touch the database:
+    writes in this process are applied directly, and changes made by other
+    processes are pulled in by a background refresh.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = None
+        self._built_at = 0.0
+        self._refreshed_at = 0.0
+        self._watermark = None
+        self._refreshing = False
+
+    def _product_rows(self, queryset):
+        rows = queryset.filter(is_active=True).annotate(
+            popularity=Coalesce(Sum("orderitem__quantity"), 0)
+        )
+        return list(
+            rows.values_list(
+                "id", "name", "slug", "brand", "category__slug", "popularity"
+            )
+        )
+
+    def rebuild(self):
+        started = time.monotonic()
+        watermark = Product.objects.aggregate(latest=Max("updated_at"))["latest"]
+        categories = Category.objects.annotate(
+            count=Count("products", filter=Q(products__is_active=True))
+        ).values_list("slug", "name", "count")
+        state = _State()
+        state.bulk_load(self._product_rows(Product.objects.all()), categories)
+        with self._lock:
+            self._state = state
+            self._built_at = self._refreshed_at = started
+            self._watermark = watermark
+
+    def refresh(self):
+        """Apply products changed since the last build or refresh"""
+        started = time.monotonic()
+        if self._watermark is None or started - self._built_at > FULL_REBUILD_SECONDS:
+            self.rebuild()
+            return
+        changed = Product.objects.filter(
+            updated_at__gte=self._watermark - WATERMARK_SKEW
+        )
+        latest = changed.aggregate(latest=Max("updated_at"))["latest"]
+        inactive = list(changed.filter(is_active=False).values_list("id", flat=True))
+        rows = self._product_rows(changed)
+        with self._lock:
+            for product_id in inactive:
+                self._state.remove_product(product_id)
+            for row in rows:
+                self._state.remove_product(row[0])
+                self._state.add_product(*row)
+            self._refreshed_at = started
+            if latest is not None:
+                self._watermark = max(self._watermark, latest)
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh()
+        finally:
+            with self._lock:
+                self._refreshing = False
+            connection.close()
+
+    def _ensure_fresh(self):
+        if self._state is None:
+            self.rebuild()
+            return
+        # Tested and set under the lock, so that one request starts the refresh
+        with self._lock:
+            if (
+                self._refreshing
+                or time.monotonic() - self._refreshed_at < REFRESH_SECONDS
+            ):
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh_in_background, daemon=True).start()
+
+    def suggest(self, text, limit=8):
+        prefix = normalize(text)
+        if not prefix:
+            return []
+        self._ensure_fresh()
+        with self._lock:
+            return self._state.search(prefix, min(limit, MAX_SUGGESTIONS))
+
+    def product_changed(self, product_id, name, slug, brand, category, is_active):
+        """Apply a product written by this process, keeping its popularity"""
+        with self._lock:
+            if self._state is None:
+                return
+            previous = self._state.remove_product(product_id)
+            if is_active:
+                popularity = previous["weight"] if previous else 0
+                self._state.add_product(
+                    product_id, name, slug, brand, category, popularity
+                )
+
+    def product_deleted(self, product_id):
+        with self._lock:
+            if self._state is not None:
+                self._state.remove_product(product_id)
+
+
+suggest_index = SuggestIndex()
@@ -57,6 +57,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "server",
 ]
@@ -88,6 +89,7 @@ CORS_ALLOW_METHODS = [
 CORS_ALLOW_HEADERS = [
     *default_headers,
     "X-CSRFToken",
+    "Idempotency-Key",
 ]
 
 
@@ -124,6 +126,39 @@ TEMPLATES = [
 WSGI_APPLICATION = "server.wsgi.application"
 
 IMGBB_API_KEY = os.getenv("API_IMG_KEY")
+# Cache shared by every worker, so that invalidating the dashboard stats
+# reaches them all. Created by ``manage.py createcachetable``. It holds a
+# generation and a few ``days`` windows per stats table; culling starts far
+# above that, and then drops a tenth of the entries rather than a third.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": os.getenv("CACHE_TABLE", "server_cache"),
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.getenv("CACHE_MAX_ENTRIES", 10000)),
+            "CULL_FREQUENCY": int(os.getenv("CACHE_CULL_FREQUENCY", 10)),
+        },
+    }
+}
+# Seconds an unpaid order holds its stock before the sweep releases it
+STOCK_RESERVATION_TTL = int(os.getenv("STOCK_RESERVATION_TTL", 15 * 60))
+# Seconds a stored Idempotency-Key response is replayed for
+IDEMPOTENCY_KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", 24 * 60 * 60))
+# Seconds a request holds its Idempotency-Key before a retry may take the
+# key over, when the request died without storing a response
+IDEMPOTENCY_CLAIM_LEASE = int(os.getenv("IDEMPOTENCY_CLAIM_LEASE", 60))
+# Seconds the staff dashboard stats are cached for; order and product
+# writes invalidate them in every worker through the shared cache
+ADMIN_STATS_TTL = int(os.getenv("ADMIN_STATS_TTL", 60))
+# Seconds a checkout quote keeps its prices for create_order
+ORDER_QUOTE_TTL = int(os.getenv("ORDER_QUOTE_TTL", 5 * 60))
+# Range partition orders and order items by month (PostgreSQL only). Read
+# by migration 0017, so it has to be set before migrating.
+ORDER_PARTITIONING = os.getenv("ORDER_PARTITIONING", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
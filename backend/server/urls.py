@@ -9,6 +9,8 @@ from server.controller.product_controller import (
     get_product_filters,
     get_product_by_category,
     get_product_detailed,
+    search_product_catalog,
+    suggest_products,
 )
 from .controller.auth_controller import (
     register,
@@ -27,22 +29,35 @@ from .controller.admin_controller import (
     manage_staff,
     get_staff_list,
     get_admin_stats,
+    get_sales_timeseries,
     manage_products,
     manage_orders,
     get_categories,
+    get_product_inventory,
+    bulk_update_order_status,
 )
 from .controller.customer_order_controller import (
     create_order,
+    get_order_quote,
     get_user_orders,
     get_order_details,
     process_payment,
     get_user_by_id,
 )
+from .controller.cart_controller import (
+    manage_cart,
+    manage_cart_items,
+    remove_cart_item,
+    merge_guest_cart,
+)
 from .controller.product_controller import (
     upload_product_image,
     delete_product_image,
     check_product_stock,
+    check_product_stock_batch,
+    get_products_batch,
     get_recommended_products,
+    get_similar_products,
 )
 
 urlpatterns = [
@@ -55,12 +70,25 @@ urlpatterns = [
         get_recommended_products,
         name="recommended-products",
     ),
+    path("api/products/batch/", get_products_batch, name="products-batch"),
+    path(
+        "api/products/check-stock/",
+        check_product_stock_batch,
+        name="check-product-stock-batch",
+    ),
     path(
         "api/products/check-stock/<int:id>/",
         check_product_stock,
         name="check-product-stock",
     ),
     path("api/products/filters/", get_product_filters, name="product-filters"),
+    path("api/products/search/", search_product_catalog, name="product-search"),
+    path("api/products/suggest/", suggest_products, name="product-suggest"),
+    path(
+        "api/products/<int:id>/similar/",
+        get_similar_products,
+        name="similar-products",
+    ),
     path("api/products/<str:category>/", get_product_by_category, name="category"),
     path("api/products/<int:id>/", get_product_detailed_single_route, name="product"),
     path(
@@ -86,7 +114,6 @@ urlpatterns = [
         name="validate_reset_token",
     ),
     # Staff api endpoints
-    
     path("api/admin/staff/", get_staff_list, name="staff-list"),
     path(
         "api/admin/staff/<int:staff_id>/",
@@ -94,13 +121,28 @@ urlpatterns = [
         name="staff-detail",
     ),
     path("api/staff/stats/", get_admin_stats, name="staff-stats"),
+    path(
+        "api/staff/stats/timeseries/",
+        get_sales_timeseries,
+        name="staff-stats-timeseries",
+    ),
     path("api/staff/products/", manage_products, name="staff-products"),
     path(
         "api/staff/products/<int:product_id>/",
         manage_products,
         name="staff-product-detail",
     ),
+    path(
+        "api/staff/products/<int:product_id>/inventory/",
+        get_product_inventory,
+        name="staff-product-inventory",
+    ),
     path("api/staff/orders/", manage_orders, name="staff-orders"),
+    path(
+        "api/staff/orders/bulk-status/",
+        bulk_update_order_status,
+        name="staff-orders-bulk-status",
+    ),
     path(
         "api/staff/orders/<int:order_id>/",
         manage_orders,
@@ -120,7 +162,12 @@ urlpatterns = [
         "api/user/get_user_by_id/<int:user_id>/", get_user_by_id, name="get-user-by-id"
     ),
     path("api/categories/", get_categories, name="categories"),
+    path("api/cart/", manage_cart, name="cart"),
+    path("api/cart/items/", manage_cart_items, name="cart-items"),
+    path("api/cart/items/<int:product_id>/", remove_cart_item, name="cart-item-detail"),
+    path("api/cart/merge/", merge_guest_cart, name="cart-merge"),
     path("api/orders/create/", create_order, name="create-order"),
+    path("api/orders/quote/", get_order_quote, name="order-quote"),
     path("api/orders/", get_user_orders, name="user-orders"),
     path("api/orders/<int:order_id>/", get_order_details, name="order-details"),
     path("api/auth/update-profile/", update_profile, name="update_profile"),